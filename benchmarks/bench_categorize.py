@@ -0,0 +1,122 @@
+"""Compare the compiled categorizer with the original chained-``any`` version.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_categorize [--titles 100000] [--unique] [--scale N]
+
+With the shipped table (42 keywords) there is little to gain in CPython:
+the old code runs C substring searches, and the compiled regex is about
+1.0-1.2x faster on 100k titles, batched or not. ``--scale`` pads the rule
+table with synthetic keywords to show how each approach grows with the
+number of rules; the legacy cost grows with it and the compiled one barely
+does (about 7x at ``--scale 10``).
+"""
+import argparse
+import json
+import random
+import time
+
+from kanoha_import.categorize import RULES_FILE, Categorizer
+
+
+def legacy_categorize(title):
+    # categorize_product() as it was in parse_xml_products_v3.py
+    title_lower = title.lower()
+    if any(x in title_lower for x in ['earbud', 'headphone', 'speaker', 'audio', 'sound', 'mic', 'radio']):
+        return "Audio"
+    if any(x in title_lower for x in ['adapter', 'plug', 'cable', 'charger', 'usb', 'power', 'battery']):
+        return "Electronics Accessories"
+    if any(x in title_lower for x in ['kitchen', 'cook', 'pan', 'pot', 'knife', 'blender', 'grill', 'maker']):
+        return "Kitchenware"
+    if any(x in title_lower for x in ['toy', 'game', 'puzzle', 'doll', 'car']):
+        return "Toys & Games"
+    if any(x in title_lower for x in ['bag', 'case', 'backpack', 'tote', 'luggage']):
+        return "Bags & Cases"
+    if any(x in title_lower for x in ['watch', 'clock', 'alarm']):
+        return "Clocks & Watches"
+    return "General Merchandise"
+
+
+BRANDS = ["Elama", "Gibson Home", "Crock-Pot", "beFree Sound", "GameFitz", "Brentwood",
+          "MegaChef", "Better Chef", "Cravings By Chrissy Teigen", "Naxa", "Trexonic", "iLuv"]
+NOUNS = ["Dinnerware Set", "Bar Stool", "Waffle Maker", "Bluetooth Speaker", "Wireless Earbuds",
+         "Travel Adapter", "Gaming Chair", "Flatware Set", "Wall Clock", "Backpack", "Toaster",
+         "Canister", "Turntable", "Lazy Susan", "Dutch Oven", "Stemless Wine Glass", "Tote Bag",
+         "USB Cable", "Electric Scooter", "Puzzle Box", "Pressure Cooker", "Media Player"]
+ADJECTIVES = ["Round", "Enameled", "Stoneware", "Vintage", "Faux Leather", "Adjustable", "Portable",
+              "Nonstick", "Melamine", "Lightweight", "Black", "Blue Sage", "Tufted", "Glass"]
+
+
+def legacy_table_categorize(title, rules, default="General Merchandise"):
+    # The same chained any() shape, driven by an arbitrary rule table
+    title_lower = title.lower()
+    for rule in rules:
+        if any(x.rstrip('*') in title_lower for x in rule['keywords']):
+            return rule['category']
+    return default
+
+
+def scaled_rules(rules, factor, seed=0):
+    """Pad every rule with synthetic keywords, as a larger rule table would."""
+    rng = random.Random(seed)
+    letters = 'bcdfghjklmnpqrstvwxz'
+    return [
+        {'category': rule['category'],
+         'keywords': rule['keywords'] + [
+             ''.join(rng.choice(letters) for _ in range(rng.randint(4, 9)))
+             for _ in range(len(rule['keywords']) * (factor - 1))]}
+        for rule in rules
+    ]
+
+
+def synthetic_titles(count, seed=0):
+    rng = random.Random(seed)
+    return [
+        f"{rng.choice(BRANDS)} {rng.randint(2, 20)} Piece {rng.choice(ADJECTIVES)} "
+        f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} in {rng.choice(ADJECTIVES)}"
+        for _ in range(count)
+    ]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--titles', type=int, default=100_000)
+    parser.add_argument('--unique', action='store_true',
+                        help="make every title unique so the batch cache never hits")
+    parser.add_argument('--scale', type=int, default=1,
+                        help="multiply the number of keywords per rule with synthetic ones")
+    args = parser.parse_args()
+
+    titles = synthetic_titles(args.titles)
+    if args.unique:
+        titles = [f"{t} #{i}" for i, t in enumerate(titles)]
+    with open(RULES_FILE, 'r') as f:
+        rules = json.load(f)['rules']
+    if args.scale > 1:
+        rules = scaled_rules(rules, args.scale)
+        legacy_fn = lambda t: legacy_table_categorize(t, rules)
+    else:
+        legacy_fn = legacy_categorize
+    categorizer = Categorizer(rules)
+
+    legacy, legacy_s = timed(lambda ts: [legacy_fn(t) for t in ts], titles)
+    single, single_s = timed(lambda ts: [categorizer.categorize(t) for t in ts], titles)
+    batch, batch_s = timed(categorizer.categorize_many, titles)
+
+    print(f"{len(titles)} titles, {sum(len(r['keywords']) for r in rules)} keywords")
+    print(f"  legacy chained any():   {legacy_s:8.3f}s")
+    print(f"  compiled, per title:    {single_s:8.3f}s  ({legacy_s / single_s:.1f}x)")
+    print(f"  compiled, batch:        {batch_s:8.3f}s  ({legacy_s / batch_s:.1f}x)")
+    differs = sum(a != b for a, b in zip(legacy, batch))
+    print(f"  titles categorized differently (word boundaries): {differs}")
+    assert single == batch
+
+
+if __name__ == "__main__":
+    main()
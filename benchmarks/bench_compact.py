@@ -0,0 +1,55 @@
+"""Size and load time of products.json against the compact catalog format.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_compact [client/src/data/products.json] [--repeat 200]
+"""
+import argparse
+import gzip
+import json
+import time
+
+from kanoha_import import compact
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('products', nargs='?', default='client/src/data/products.json')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    with open(args.products, 'r', encoding='utf-8') as f:
+        original = f.read()
+    products = json.loads(original)
+    packed = compact.dumps(products)
+    assert compact.loads(packed) == products, "compact round trip changed the catalog"
+
+    rows = [
+        ("products.json (indent=2)", original.encode('utf-8'), lambda: json.loads(original)),
+        ("products.json minified", json.dumps(products, separators=(',', ':')).encode('utf-8'), None),
+        ("compact .json", packed.encode('utf-8'), lambda: compact.loads(packed)),
+    ]
+    try:
+        binary = compact.dumps(products, binary=True)
+        rows.append(("compact .msgpack", binary, lambda: compact.loads(binary, binary=True)))
+    except ImportError:
+        print("(msgpack not installed; skipping the MessagePack variant)")
+
+    print(f"{len(products)} products, load time averaged over {args.repeat} runs")
+    base = len(rows[0][1])
+    for name, data, load in rows:
+        gz = len(gzip.compress(data, compresslevel=9))
+        load_ms = f"{timed(load, args.repeat):6.2f} ms" if load else "        -"
+        print(f"  {name:<26} {len(data):>9} B ({len(data) / base:5.1%})  gzip {gz:>8} B  load {load_ms}")
+    print(f"  compact .json, JSON parse only            load {timed(lambda: json.loads(packed), args.repeat):6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
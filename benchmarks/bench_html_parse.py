@@ -0,0 +1,101 @@
+"""Per-page parse time and memory of each installed HTML backend.
+
+Run from the repository root against saved shop pages:
+
+    python -m benchmarks.bench_html_parse saved_pages/*.html
+    python -m benchmarks.bench_html_parse --synthetic 20   # no saved pages
+
+Each backend runs in its own process so peak RSS is not shared between them.
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import random
+import resource
+import statistics
+import time
+
+from kanoha_import.html_backends import available_backends, get_backend
+
+
+def synthetic_page(items=24, seed=0):
+    """A WooCommerce-like shop page with ``items`` products."""
+    rng = random.Random(seed)
+    cards = []
+    for i in range(items):
+        slug = rng.choice(['audio', 'kitchenware', 'toys-games', 'bags-cases'])
+        cards.append(f"""
+<li class="product type-product post-{i} status-publish instock product_cat-{slug} has-post-thumbnail shipping-taxable purchasable product-type-simple">
+  <a href="https://kanohagoods.com/product/item-{i}/" class="woocommerce-LoopProduct-link woocommerce-loop-product__link">
+    <img width="300" height="300" src="https://kanohagoods.com/wp-content/uploads/2024/01/item-{i}-300x300.jpg"
+         class="attachment-woocommerce_thumbnail size-woocommerce_thumbnail" alt="" decoding="async"
+         srcset="https://kanohagoods.com/wp-content/uploads/2024/01/item-{i}-300x300.jpg 300w, https://kanohagoods.com/wp-content/uploads/2024/01/item-{i}-150x150.jpg 150w, https://kanohagoods.com/wp-content/uploads/2024/01/item-{i}.jpg 800w"
+         sizes="(max-width: 300px) 100vw, 300px" />
+    <h2 class="woocommerce-loop-product__title">Product {i} {rng.choice(['Speaker', 'Pan', 'Tote Bag', 'Puzzle'])}</h2>
+    <span class="price"><span class="woocommerce-Price-amount amount"><bdi><span class="woocommerce-Price-currencySymbol">&#36;</span>{rng.randint(5, 300)}.00</bdi></span></span>
+  </a>
+  <a href="?add-to-cart={i}" data-quantity="1" class="button product_type_simple add_to_cart_button ajax_add_to_cart" rel="nofollow">Add to cart</a>
+</li>""")
+    nav = "".join(f'<li class="menu-item"><a href="/c/{n}/">Category {n}</a></li>' for n in range(80))
+    return f"""<!DOCTYPE html><html lang="en-US"><head><meta charset="UTF-8"><title>Shop</title>
+{'<link rel="stylesheet" href="/wp-content/style.css" />' * 30}
+<script>{'var x = 1;' * 2000}</script></head>
+<body class="archive post-type-archive post-type-archive-product woocommerce woocommerce-page">
+<header><nav><ul>{nav}</ul></nav></header>
+<main><ul class="products columns-4">{''.join(cards)}</ul></main>
+<footer>{'<p>Footer text</p>' * 50}</footer></body></html>"""
+
+
+def _run(name, pages, repeat, queue):
+    backend = get_backend(name)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    timings = []
+    items = 0
+    for _ in range(repeat):
+        for html in pages:
+            start = time.perf_counter()
+            items += len(backend.extract(html))
+            timings.append(time.perf_counter() - start)
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((timings, items, rss_after - rss_before, backend.extract(pages[0])))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('pages', nargs='*', help="saved shop page HTML files or directories")
+    parser.add_argument('--synthetic', type=int, default=0,
+                        help="generate this many synthetic pages instead")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    files = []
+    for path in args.pages:
+        files.extend(sorted(glob.glob(os.path.join(path, '*.html'))) if os.path.isdir(path) else [path])
+    if files:
+        pages = []
+        for path in files:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                pages.append(f.read())
+    else:
+        pages = [synthetic_page(seed=i) for i in range(args.synthetic or 10)]
+
+    total_kb = sum(len(p) for p in pages) / 1024
+    print(f"{len(pages)} pages, {total_kb:.0f} KB, x{args.repeat}")
+    reference = None
+    for name in available_backends():
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=_run, args=(name, pages, args.repeat, queue))
+        process.start()
+        timings, items, rss_kb, first = queue.get()
+        process.join()
+        if reference is None:
+            reference = first
+        same = "same items" if first == reference else "ITEMS DIFFER"
+        print(f"  {name:<11} mean {statistics.mean(timings) * 1000:7.2f} ms/page  "
+              f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1] * 1000:7.2f} ms  "
+              f"peak RSS +{rss_kb / 1024:6.1f} MB  {items // args.repeat} items  {same}")
+
+
+if __name__ == "__main__":
+    main()
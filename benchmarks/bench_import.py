@@ -0,0 +1,285 @@
+"""End-to-end import benchmark on synthetic WXR exports and a local image host.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_import --items 1000,10000,100000
+    python -m benchmarks.bench_import --items 1000 --latency 0.05 --failure-rate 0.02
+    python -m benchmarks.bench_import --compare benchmarks/results/import-<earlier>.json
+
+For each size it generates a WXR file (``benchmarks.wxr_gen``) and measures:
+
+* parse: streaming every item with ``wxr.iter_items`` and reading its
+  postmeta, as items/s and MB/s;
+* categorize: ``categorize_product`` per title and ``categorize_many`` over
+  all product titles;
+* download: ``download_all`` against ``benchmarks.image_server``, once cold
+  and once revalidating through the manifest;
+* end-to-end: ``xml attachments`` (``kanoha_import.xml_attachments``) on a
+  scratch site directory.
+
+Each stage runs in a fresh, non-daemonic process, so its peak RSS is its
+own and the import can start its own process pools. A stage that fails
+stops the benchmark. Results are written as JSON (``benchmarks/results/``
+by default) for comparing runs.
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+import traceback
+
+from benchmarks.image_server import ImageServer
+from benchmarks.wxr_gen import generate_wxr
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _parse(wxr_path):
+    from kanoha_import.wxr import iter_items, namespaces, postmeta
+    start = time.perf_counter()
+    cpu = time.process_time()
+    items = meta_values = 0
+    titles = []
+    for item in iter_items(wxr_path):
+        items += 1
+        meta_values += len(postmeta(item))
+        if item.findtext('wp:post_type', None, namespaces) == 'product':
+            titles.append(item.findtext('title'))
+    elapsed = time.perf_counter() - start
+    size_mb = os.path.getsize(wxr_path) / 1e6
+    return {'items': items, 'postmeta': meta_values, 'seconds': round(elapsed, 3),
+            'cpu_seconds': round(time.process_time() - cpu, 3),
+            'items_per_s': round(items / elapsed), 'mb_per_s': round(size_mb / elapsed, 1),
+            'peak_rss_mb': _peak_rss_mb()}, titles
+
+
+def _parse_stage(wxr_path):
+    return _parse(wxr_path)[0]
+
+
+def _categorize_stage(wxr_path):
+    from kanoha_import.categorize import categorize_many, categorize_product
+    titles = _parse(wxr_path)[1]
+    start = time.perf_counter()
+    for title in titles:
+        categorize_product(title)
+    single = time.perf_counter() - start
+    start = time.perf_counter()
+    categorize_many(titles)
+    batch = time.perf_counter() - start
+    return {'titles': len(titles),
+            'per_title_per_s': round(len(titles) / single) if single else None,
+            'many_per_s': round(len(titles) / batch) if batch else None}
+
+
+def _download_stage(urls, workdir, limit, per_host):
+    from kanoha_import.downloader import download_all
+    from kanoha_import.manifest import DownloadManifest
+    image_dir = os.path.join(workdir, 'images')
+    os.makedirs(image_dir, exist_ok=True)
+    tasks = [(url, os.path.join(image_dir, f"{i}.jpg")) for i, url in enumerate(urls)]
+    manifest = DownloadManifest(os.path.join(workdir, 'downloads.json'))
+    passes = {}
+    for name in ('cold', 'revalidate'):
+        start = time.perf_counter()
+        results = download_all(tasks, limit=limit, per_host=per_host, manifest=manifest)
+        elapsed = time.perf_counter() - start
+        fetched = sum(r.size for r in results if r.ok and not r.skipped)
+        failed = {}
+        for r in results:
+            if not r.ok:
+                reason = r.error.split(':')[0]
+                failed[reason] = failed.get(reason, 0) + 1
+        passes[name] = {'images': len(tasks), 'seconds': round(elapsed, 3),
+                        'images_per_s': round(len(tasks) / elapsed, 1),
+                        'mb_per_s': round(fetched / 1e6 / elapsed, 2),
+                        'not_modified': sum(1 for r in results if r.status == 304),
+                        'failed': failed}
+    passes['peak_rss_mb'] = _peak_rss_mb()
+    return passes
+
+
+def _end_to_end_stage(wxr_path, workdir):
+    from kanoha_import import xml_attachments
+    from kanoha_import.paths import Paths
+    paths = Paths(os.path.join(workdir, 'site'), wxr_path)
+    start = time.perf_counter()
+    cpu = time.process_time()
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        status = xml_attachments.run(paths, optimize=True, image_meta=True, search_index=True)
+    elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu
+    with open(paths.report_file) as f:
+        report = json.load(f)
+    failures = report['counters'].get('failures')
+    if status or failures or 'write_json' not in report['stages']:
+        raise RuntimeError(f"import failed ({failures}):\n{output.getvalue()}")
+    with open(paths.data_file) as f:
+        products = len(json.load(f))
+    return {'products': products, 'seconds': round(elapsed, 3), 'cpu_seconds': round(cpu, 3),
+            'peak_rss_mb': _peak_rss_mb(),
+            'stages': {name: stage['wall_seconds'] for name, stage in report['stages'].items()}}
+
+
+class StageFailed(Exception):
+    """A benchmark stage raised in its process."""
+
+
+def _stage_main(conn, fn, args):
+    try:
+        conn.send(('ok', fn(*args)))
+    except ImportError as e:
+        conn.send(('skipped', str(e)))
+    except BaseException:
+        conn.send(('error', traceback.format_exc()))
+    finally:
+        conn.close()
+
+
+def run_isolated(fn, *args):
+    """Run ``fn(*args)`` in a fresh interpreter and return its result.
+
+    The process is not daemonic, so the stage may start process pools of its
+    own. A missing optional dependency skips the stage; any other error
+    raises :class:`StageFailed`.
+    """
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_stage_main, args=(sender, fn, args))
+    process.start()
+    sender.close()
+    try:
+        status, value = receiver.recv()
+    except EOFError:
+        status, value = 'error', "the process exited without a result"
+    finally:
+        receiver.close()
+        process.join()
+    if status == 'skipped':
+        return {'skipped': value}
+    if status == 'error':
+        raise StageFailed(f"{fn.__name__} failed (exit code {process.exitcode}):\n{value}")
+    return value
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, previous):
+    """Print throughput and time ratios against an earlier results file."""
+    old_runs = {run['items']: run for run in previous['runs']}
+    print(f"\nCompared with {previous.get('commit')} ({previous.get('started')}):")
+    for run in current['runs']:
+        old = old_runs.get(run['items'])
+        if old is None:
+            continue
+        for stage, key in (('parse', 'items_per_s'), ('categorize', 'many_per_s'),
+                           ('end_to_end', 'seconds'), ('parse', 'peak_rss_mb')):
+            new_value, old_value = run[stage].get(key), old[stage].get(key)
+            if new_value and old_value:
+                print(f"  {run['items']:>8} items  {stage}.{key}: {old_value} -> {new_value} "
+                      f"({new_value / old_value:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', default="1000,10000",
+                        help="comma-separated WXR sizes, e.g. 1000,100000,1000000")
+    parser.add_argument('--download-images', type=int, default=2000,
+                        help="images fetched in the download stage")
+    parser.add_argument('--end-to-end-max', type=int, default=10000,
+                        help="largest size to run the full import on")
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--throughput', type=float, default=None,
+                        help="bytes per second per connection")
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--image-size', type=int, default=60_000)
+    parser.add_argument('--limit', type=int, default=32)
+    parser.add_argument('--per-host', type=int, default=8)
+    parser.add_argument('--output', help="results file (default: benchmarks/results/import-<time>.json)")
+    parser.add_argument('--compare', help="earlier results file to compare with")
+    parser.add_argument('--keep', action='store_true', help="keep the generated files")
+    args = parser.parse_args()
+
+    started = datetime.datetime.now(datetime.timezone.utc)
+    results = {
+        'started': started.isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'config': {k: v for k, v in vars(args).items() if k not in ('output', 'compare', 'keep')},
+        'runs': [],
+    }
+    workdir = tempfile.mkdtemp(prefix='kanoha-bench-')
+    server = ImageServer(latency=args.latency, throughput=args.throughput,
+                         failure_rate=args.failure_rate, size=args.image_size).start()
+    try:
+        for items in (int(n) for n in args.items.split(',')):
+            wxr_path = os.path.join(workdir, f"shop-{items}.xml")
+            start = time.perf_counter()
+            generate_wxr(wxr_path, items, image_base=server.url)
+            run = {'items': items, 'wxr_mb': round(os.path.getsize(wxr_path) / 1e6, 1),
+                   'generate_seconds': round(time.perf_counter() - start, 2)}
+            print(f"{items} items ({run['wxr_mb']} MB)")
+
+            run['parse'] = run_isolated(_parse_stage, wxr_path)
+            print(f"  parse       {run['parse']}")
+            run['categorize'] = run_isolated(_categorize_stage, wxr_path)
+            print(f"  categorize  {run['categorize']}")
+
+            urls = [f"{server.url}/wp-content/uploads/bench/{items}/{i}.jpg"
+                    for i in range(min(args.download_images, items))]
+            stage_dir = os.path.join(workdir, f"download-{items}")
+            run['download'] = run_isolated(_download_stage, urls, stage_dir,
+                                           args.limit, args.per_host)
+            print(f"  download    {run['download']}")
+
+            if items <= args.end_to_end_max:
+                stage_dir = os.path.join(workdir, f"import-{items}")
+                run['end_to_end'] = run_isolated(_end_to_end_stage, wxr_path, stage_dir)
+            else:
+                run['end_to_end'] = {'skipped': f"larger than --end-to-end-max {args.end_to_end_max}"}
+            print(f"  end-to-end  {run['end_to_end']}")
+            results['runs'].append(run)
+    finally:
+        server.stop()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+    results['server'] = {'requests': server.requests, 'failures': server.failures,
+                         'not_modified': server.not_modified}
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"import-{started.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+    if args.keep:
+        print(f"Generated files kept in {workdir}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
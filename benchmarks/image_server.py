@@ -0,0 +1,183 @@
+"""Local stand-in for the image host, with configurable latency and failures.
+
+    python -m benchmarks.image_server --port 8765 --latency 0.05 \\
+        --throughput 2000000 --failure-rate 0.02
+
+Any ``GET`` path returns a small but real JPEG (a colored block on a
+background, padded with comment segments up to the requested size) whose
+size and content depend only on the path, so repeated runs see the same
+bytes and ETags, and every image decodes for the optimize, image meta and
+dedupe stages. Each response waits
+``latency`` seconds, streams at most ``throughput`` bytes per second per
+connection, and fails with a 503 or a connection dropped half-way through
+the body at ``failure_rate``. ``Range``/``If-Range`` requests for a single
+``bytes=N-`` range get a 206 with the rest of the body.
+"""
+import argparse
+import functools
+import hashlib
+import io
+import random
+import re
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHUNK = 16 * 1024
+# Largest comment segment payload: the length field counts itself
+_COM_PAYLOAD = 0xFFFF - 2
+
+
+@functools.lru_cache(maxsize=512)
+def jpeg_body(path, size):
+    """A deterministic, decodable JPEG of about ``size`` bytes for ``path``."""
+    from PIL import Image, ImageDraw
+
+    seed = hashlib.sha256(path.encode('utf-8')).digest()
+    rng = random.Random(seed)
+    width, height = rng.choice([(400, 400), (600, 600), (500, 375)])
+    im = Image.new('RGB', (width, height), tuple(seed[:3]))
+    left, top = rng.randrange(width // 2), rng.randrange(height // 2)
+    ImageDraw.Draw(im).rectangle((left, top, left + width // 3, top + height // 3),
+                                 fill=tuple(seed[3:6]))
+    buffer = io.BytesIO()
+    im.save(buffer, 'JPEG', quality=85)
+    data = buffer.getvalue()
+
+    # Comment segments right after SOI; decoders skip them by their length
+    padding = size - len(data)
+    block = (seed * (_COM_PAYLOAD // len(seed) + 1))[:_COM_PAYLOAD]
+    segments = []
+    while padding > 4:
+        payload = block[:min(_COM_PAYLOAD, padding - 4)]
+        segments.append(b'\xff\xfe' + struct.pack('>H', len(payload) + 2) + payload)
+        padding -= len(payload) + 4
+    return data[:2] + b''.join(segments) + data[2:]
+
+
+class ImageServer:
+    """Threaded HTTP server, usable as a context manager; ``url`` is its base URL."""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, throughput=None,
+                 failure_rate=0.0, size=60_000, seed=0):
+        self.latency = latency
+        self.throughput = throughput
+        self.failure_rate = failure_rate
+        self.size = size
+        self.requests = self.failures = self.not_modified = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+        self._thread = None
+
+    def body(self, path):
+        """``(data, etag)`` for ``path``; sizes vary around the mean like real photos."""
+        size = int(self.size * random.Random(path).uniform(0.5, 1.5))
+        etag = '"%s"' % hashlib.sha1(f"{path}:{size}".encode('utf-8')).hexdigest()
+        return jpeg_body(path, size), etag
+
+    def _failure(self):
+        # None, or how this request fails: half 503s, half dropped connections
+        with self._lock:
+            self.requests += 1
+            if self._rng.random() >= self.failure_rate:
+                return None
+            self.failures += 1
+            return '503' if self._rng.random() < 0.5 else 'drop'
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                failure = server._failure()
+                if failure == '503':
+                    self.send_error(503)
+                    return
+                data, etag = server.body(self.path)
+                if self.headers.get('If-None-Match') == etag:
+                    with server._lock:
+                        server.not_modified += 1
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                offset = 0
+                match = re.fullmatch(r'bytes=(\d+)-', self.headers.get('Range', ''))
+                if match and self.headers.get('If-Range', etag) == etag:
+                    offset = int(match.group(1))
+                    if offset >= len(data):
+                        self.send_response(416)
+                        self.send_header('Content-Range', f"bytes */{len(data)}")
+                        self.send_header('Content-Length', '0')
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header('Content-Range', f"bytes {offset}-{len(data) - 1}/{len(data)}")
+                else:
+                    self.send_response(200)
+                self.send_header('Content-Type', 'image/jpeg')
+                self.send_header('Content-Length', str(len(data) - offset))
+                self.send_header('ETag', etag)
+                self.send_header('Accept-Ranges', 'bytes')
+                self.end_headers()
+                # A dropped connection stops half-way through what was promised
+                end = offset + (len(data) - offset) // 2 if failure == 'drop' else len(data)
+                for start in range(offset, end, CHUNK):
+                    self.wfile.write(data[start:min(start + CHUNK, end)])
+                    if server.throughput:
+                        time.sleep(CHUNK / server.throughput)
+                if failure == 'drop':
+                    self.close_connection = True
+                    self.connection.shutdown(2)
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds before each response")
+    parser.add_argument('--throughput', type=float, default=None,
+                        help="bytes per second per connection")
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--size', type=int, default=60_000, help="mean image size in bytes")
+    args = parser.parse_args()
+    server = ImageServer(port=args.port, latency=args.latency, throughput=args.throughput,
+                         failure_rate=args.failure_rate, size=args.size)
+    print(f"Serving images on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
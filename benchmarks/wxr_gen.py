@@ -0,0 +1,132 @@
+"""Generate synthetic WordPress WXR exports for benchmarking the importers.
+
+    python -m benchmarks.wxr_gen /tmp/shop-100k.xml --items 100000 \\
+        --image-base http://127.0.0.1:8765
+
+Each product is followed (most of the time) by the attachment holding its
+thumbnail, with the postmeta a WooCommerce export really carries: prices,
+SKU, stock, dimensions, ``_thumbnail_id`` and serialized attachment
+metadata. A few thumbnails come before their product, as in real exports.
+Output is written as it is generated, so a million items take little memory.
+"""
+import argparse
+import random
+from xml.sax.saxutils import escape
+
+from benchmarks.bench_categorize import ADJECTIVES, BRANDS, NOUNS
+
+HEADER = """<?xml version="1.0" encoding="UTF-8" ?>
+<rss version="2.0"
+	xmlns:excerpt="http://wordpress.org/export/1.2/excerpt/"
+	xmlns:content="http://purl.org/rss/1.0/modules/content/"
+	xmlns:wfw="http://wellformedweb.org/CommentAPI/"
+	xmlns:dc="http://purl.org/dc/elements/1.1/"
+	xmlns:wp="http://wordpress.org/export/1.2/"
+>
+<channel>
+	<title>Kanoha Goods</title>
+	<link>https://kanohagoods.com</link>
+	<wp:wxr_version>1.2</wp:wxr_version>
+	<wp:base_site_url>https://kanohagoods.com</wp:base_site_url>
+"""
+FOOTER = "</channel>\n</rss>\n"
+CATEGORIES = ["Audio", "Kitchen", "Toys", "Bags", "Clocks", "Electronics", "Home Decor"]
+# Share of thumbnails exported before the product that uses them
+EARLY_ATTACHMENTS = 0.1
+
+
+def _meta(key, value):
+    return (f"\t\t<wp:postmeta>\n\t\t\t<wp:meta_key><![CDATA[{key}]]></wp:meta_key>\n"
+            f"\t\t\t<wp:meta_value><![CDATA[{value}]]></wp:meta_value>\n\t\t</wp:postmeta>\n")
+
+
+def _item(post_id, post_type, title, date, body, extra, meta):
+    return (f"\t<item>\n\t\t<title>{escape(title)}</title>\n"
+            f"\t\t<link>https://kanohagoods.com/?p={post_id}</link>\n"
+            f"\t\t<dc:creator><![CDATA[admin]]></dc:creator>\n"
+            f"\t\t<content:encoded><![CDATA[{body}]]></content:encoded>\n"
+            f"\t\t<excerpt:encoded><![CDATA[]]></excerpt:encoded>\n"
+            f"\t\t<wp:post_id>{post_id}</wp:post_id>\n"
+            f"\t\t<wp:post_date><![CDATA[{date}]]></wp:post_date>\n"
+            f"\t\t<wp:post_modified_gmt><![CDATA[{date}]]></wp:post_modified_gmt>\n"
+            f"\t\t<wp:status><![CDATA[publish]]></wp:status>\n"
+            f"\t\t<wp:post_type><![CDATA[{post_type}]]></wp:post_type>\n"
+            f"{extra}{''.join(_meta(k, v) for k, v in meta)}\t</item>\n")
+
+
+def _product(rng, post_id, thumbnail_id, title, date):
+    price = f"{rng.randint(5, 400)}.{rng.choice(['00', '49', '99'])}"
+    category = rng.choice(CATEGORIES)
+    body = "".join(f"<p>{title} {rng.choice(ADJECTIVES).lower()} finish, "
+                   f"{rng.randint(1, 12)} year warranty.</p>" for _ in range(rng.randint(1, 4)))
+    extra = (f'\t\t<category domain="product_cat" nicename="{category.lower().replace(" ", "-")}">'
+             f'<![CDATA[{category}]]></category>\n'
+             f'\t\t<category domain="product_type" nicename="simple"><![CDATA[simple]]></category>\n')
+    meta = [
+        ("_sku", f"KG-{post_id:07d}"), ("_regular_price", price), ("_price", price),
+        ("_sale_price", ""), ("_stock_status", "instock"), ("_stock", str(rng.randint(0, 500))),
+        ("_manage_stock", "yes"), ("_weight", f"{rng.uniform(0.1, 20):.2f}"),
+        ("_length", str(rng.randint(2, 60))), ("_width", str(rng.randint(2, 60))),
+        ("_height", str(rng.randint(2, 60))), ("_visibility", "visible"),
+        ("_thumbnail_id", str(thumbnail_id)), ("total_sales", str(rng.randint(0, 2000))),
+        ("_edit_last", "1"),
+    ]
+    return _item(post_id, "product", title, date, body, extra, meta)
+
+
+def _attachment(rng, post_id, title, date, image_base, month):
+    name = f"{title.lower().replace(' ', '-')[:40]}-{post_id}.jpg"
+    path = f"2025/{month:02d}/{name}"
+    width, height = rng.choice([(800, 800), (1200, 1200), (1000, 750), (600, 900)])
+    extra = (f"\t\t<wp:attachment_url><![CDATA[{image_base}/wp-content/uploads/{path}]]>"
+             f"</wp:attachment_url>\n")
+    serialized = (f'a:4:{{s:5:"width";i:{width};s:6:"height";i:{height};'
+                  f's:4:"file";s:{len(path)}:"{path}";s:5:"sizes";a:0:{{}}}}')
+    meta = [("_wp_attached_file", path), ("_wp_attachment_metadata", serialized),
+            ("_wp_attachment_image_alt", title)]
+    return _item(post_id, "attachment", title, date, "", extra, meta)
+
+
+def generate_wxr(path, items, image_base="http://127.0.0.1:8765", seed=0):
+    """Write a WXR file with ``items`` items (about half products, half images)."""
+    rng = random.Random(seed)
+    post_id = 100
+    written = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(HEADER)
+        while written < items:
+            title = (f"{rng.choice(BRANDS)} {rng.choice(ADJECTIVES)} "
+                     f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}")
+            month = rng.randint(1, 12)
+            date = f"2025-{month:02d}-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:00:00"
+            product_id, thumbnail_id = post_id, post_id + 1
+            post_id += 2
+            product = _product(rng, product_id, thumbnail_id, title, date)
+            attachment = _attachment(rng, thumbnail_id, title, date, image_base, month)
+            if items - written == 1:
+                f.write(attachment)
+                written += 1
+                break
+            first, second = ((attachment, product) if rng.random() < EARLY_ATTACHMENTS
+                             else (product, attachment))
+            f.write(first)
+            f.write(second)
+            written += 2
+        f.write(FOOTER)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('output')
+    parser.add_argument('--items', type=int, default=1000)
+    parser.add_argument('--image-base', default="http://127.0.0.1:8765",
+                        help="scheme and host the attachment URLs point at")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    count = generate_wxr(args.output, args.items, args.image_base, args.seed)
+    print(f"Wrote {count} items to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+import manifest from "@/data/asset-manifest.json";
+
+// Logical image URL -> content-hashed copy under /static/, written by the
+// publish stage of the Python importer; empty until it has run
+const assets: Record<string, string> = manifest;
+
+export function asset(url: string) {
+  return assets[url] ?? url;
+}
+
+export function assetSrcSet(srcset?: string) {
+  return srcset
+    ?.split(", ")
+    .map((entry) => {
+      const [url, width] = entry.split(" ");
+      return `${asset(url)} ${width}`;
+    })
+    .join(", ");
+}
@@ -1,6 +1,7 @@
 import { useEffect, useState } from "react";
 import { useRoute } from "wouter";
 import { useCart } from "@/contexts/CartContext";
+import { asset } from "@/lib/assets";
 import productData from "@/data/products.json";
 import { Button } from "@/components/ui/button";
 import { ArrowLeft, Check, ShoppingCart } from "lucide-react";
@@ -72,7 +73,7 @@ export default function ProductDetail() {
           {/* Image Section */}
           <div className="w-full lg:w-1/2 bg-white rounded-lg p-8 md:p-16 flex items-center justify-center border border-border">
             <img // turbo-all
-              src={currentProduct.img}
+              src={asset(currentProduct.img)}
               alt={currentProduct.name}
               className="max-w-full max-h-[500px] object-contain"
               onError={(e) => { (e.target as HTMLImageElement).src = "/images/products/placeholder.webp"; }}
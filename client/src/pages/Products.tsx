@@ -8,6 +8,7 @@ import { Label } from "@/components/ui/label";
 import { Textarea } from "@/components/ui/textarea";
 import productData from "@/data/products.json";
 import { useCart } from "@/contexts/CartContext";
+import { asset, assetSrcSet } from "@/lib/assets";
 import { toast } from "sonner";
 
 // Mock Data Structure (Fallback if JSON is empty initially)
@@ -17,6 +18,11 @@ interface Product {
   price: string;
   category: string;
   img: string;
+  srcset?: string;
+  width?: number;
+  height?: number;
+  color?: string;
+  lqip?: string;
   description: string;
   features: string[];
 }
@@ -172,10 +178,15 @@ export default function Products() {
                   >
                     <div className="aspect-square relative overflow-hidden bg-white p-8 flex items-center justify-center">
                       <img
-                        src={product.img}
+                        src={asset(product.img)}
+                        srcSet={assetSrcSet(product.srcset)}
+                        sizes="(min-width: 1024px) 25vw, (min-width: 768px) 50vw, 100vw"
+                        width={product.width}
+                        height={product.height}
+                        style={{ backgroundColor: product.color, backgroundImage: product.lqip && `url(${product.lqip})`, backgroundSize: "cover" }}
                         alt={product.name}
                         loading="lazy"
-                        className="max-w-full max-h-full object-contain group-hover:scale-110 transition-transform duration-500"
+                        className="max-w-full max-h-full h-auto object-contain group-hover:scale-110 transition-transform duration-500"
                         onError={(e) => { (e.target as HTMLImageElement).src = "/images/products/placeholder.webp"; }}
                       />
                       <div className="absolute inset-0 bg-black/40 opacity-0 group-hover:opacity-100 transition-opacity duration-300 flex items-center justify-center">
@@ -0,0 +1 @@
+"""Shared helpers for the product import scripts."""
@@ -0,0 +1,270 @@
+"""SQLite catalog store shared by the importers, the scraper and the cleaner.
+
+Products are kept one row each, keyed by source and id, with the full
+record as JSON and the fields that are queried (category, name,
+description) pulled out into indexed columns::
+
+    store = CatalogStore(CATALOG_DB)
+    store.replace_source(products, 'wxr')            # upsert, drop what is gone
+    store.update('wxr', '1293', category='Kitchen')  # one record, in place
+    store.search('glass bowl')                       # FTS5 over name/description
+    store.export_json(DATA_FILE)                     # streamed, products.json layout
+
+``source`` says which pipeline wrote a product ('wxr', 'scrape'...). Ids
+are only unique within a source: the scraper numbers its products from 1,
+which says nothing about WXR post ids. Exports list products by source,
+then in the order their source wrote them, which for a single-source
+catalog is exactly the order of the run.
+"""
+import itertools
+import json
+import os
+import sqlite3
+import time
+
+from kanoha_import.paths import atomic_open
+from kanoha_import.shards import ShardWriter, list_record
+
+# PRAGMA user_version; 1 keyed products by id alone
+SCHEMA_VERSION = 2
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id TEXT NOT NULL,
+    source TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    category TEXT,
+    name TEXT,
+    description TEXT,
+    data TEXT NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (source, id)
+);
+CREATE INDEX IF NOT EXISTS products_category ON products (category);
+CREATE INDEX IF NOT EXISTS products_source ON products (source, position);
+CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5 (
+    name, description, content='products', content_rowid='rowid', tokenize='unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS products_ai AFTER INSERT ON products BEGIN
+    INSERT INTO products_fts (rowid, name, description)
+    VALUES (new.rowid, new.name, new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS products_ad AFTER DELETE ON products BEGIN
+    INSERT INTO products_fts (products_fts, rowid, name, description)
+    VALUES ('delete', old.rowid, old.name, old.description);
+END;
+CREATE TRIGGER IF NOT EXISTS products_au AFTER UPDATE OF name, description ON products BEGIN
+    INSERT INTO products_fts (products_fts, rowid, name, description)
+    VALUES ('delete', old.rowid, old.name, old.description);
+    INSERT INTO products_fts (rowid, name, description)
+    VALUES (new.rowid, new.name, new.description);
+END;
+"""
+
+# Rows whose record and position are unchanged are left alone
+UPSERT = """
+INSERT INTO products (id, source, position, category, name, description, data, updated)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (source, id) DO UPDATE SET
+    position = excluded.position, category = excluded.category, name = excluded.name,
+    description = excluded.description, data = excluded.data, updated = excluded.updated
+WHERE products.data != excluded.data OR products.position != excluded.position
+"""
+# Same, but a product already in the store keeps its place
+UPSERT_IN_PLACE = """
+INSERT INTO products (id, source, position, category, name, description, data, updated)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (source, id) DO UPDATE SET
+    category = excluded.category, name = excluded.name, description = excluded.description,
+    data = excluded.data, updated = excluded.updated
+WHERE products.data != excluded.data
+"""
+# A version 1 store is rebuilt around its rows; the triggers refill the FTS table
+MIGRATE_V1 = """
+BEGIN;
+DROP TRIGGER products_ai;
+DROP TRIGGER products_ad;
+DROP TRIGGER products_au;
+DROP TABLE products_fts;
+DROP INDEX products_category;
+DROP INDEX products_source;
+ALTER TABLE products RENAME TO products_v1;
+{schema}
+INSERT INTO products SELECT id, source, position, category, name, description, data, updated
+FROM products_v1;
+DROP TABLE products_v1;
+COMMIT;
+"""
+
+ORDER = " ORDER BY source, position"
+
+
+def _row(product, source, position, now):
+    return (product['id'], source, position, product.get('category'), product.get('name'),
+            product.get('description'), json.dumps(product, ensure_ascii=False), now)
+
+
+def report_shared_ids(store):
+    shared = store.shared_ids()
+    if shared:
+        print(f"Warning: {len(shared)} product ids (first: {shared[0]!r}) are used by more than "
+              f"one source; the exports list those products once per source")
+
+
+class CatalogStore:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self._create()
+
+    def _create(self):
+        version = self.db.execute('PRAGMA user_version').fetchone()[0]
+        if version < SCHEMA_VERSION and self.db.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'products'").fetchone():
+            self.db.executescript(MIGRATE_V1.format(schema=SCHEMA))
+        else:
+            self.db.executescript(SCHEMA)
+        self.db.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def upsert(self, products, source):
+        """Insert or update ``products`` by id; returns how many rows changed."""
+        now = time.time()
+        with self.db:
+            start = self.db.execute('SELECT COALESCE(MAX(position) + 1, 0) FROM products '
+                                    'WHERE source = ?', (source,)).fetchone()[0]
+            return self.db.executemany(UPSERT_IN_PLACE, (_row(p, source, start + i, now)
+                                                         for i, p in enumerate(products))).rowcount
+
+    def replace_source(self, products, source):
+        """Make ``products`` the whole of ``source``, in this order.
+
+        Unchanged records are not rewritten. Returns ``(changed, removed)``.
+        """
+        now = time.time()
+        with self.db:
+            changed = self.db.executemany(UPSERT, (_row(p, source, i, now)
+                                                   for i, p in enumerate(products))).rowcount
+            self.db.execute('CREATE TEMP TABLE IF NOT EXISTS keep (id TEXT PRIMARY KEY)')
+            self.db.execute('DELETE FROM keep')
+            self.db.executemany('INSERT OR IGNORE INTO keep VALUES (?)',
+                                ((p['id'],) for p in products))
+            removed = self.db.execute('DELETE FROM products WHERE source = ? AND id NOT IN '
+                                      '(SELECT id FROM keep)', (source,)).rowcount
+        return changed, removed
+
+    def get(self, source, product_id):
+        row = self.db.execute('SELECT data FROM products WHERE source = ? AND id = ?',
+                              (source, product_id)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, source, product_id, **fields):
+        """Set ``fields`` on one product; a None value removes the field."""
+        with self.db:
+            row = self.db.execute('SELECT data, position FROM products WHERE source = ? AND id = ?',
+                                  (source, product_id)).fetchone()
+            if row is None:
+                raise KeyError((source, product_id))
+            product = json.loads(row[0])
+            for key, value in fields.items():
+                if value is None:
+                    product.pop(key, None)
+                else:
+                    product[key] = value
+            self.db.execute(UPSERT_IN_PLACE, _row(product, source, row[1], time.time()))
+        return product
+
+    def delete(self, keys):
+        """Delete the products with these ``(source, id)`` keys."""
+        with self.db:
+            return self.db.executemany('DELETE FROM products WHERE source = ? AND id = ?',
+                                       keys).rowcount
+
+    def count(self, source=None, category=None):
+        where, params = self._where(source, category)
+        return self.db.execute('SELECT COUNT(*) FROM products' + where, params).fetchone()[0]
+
+    def shared_ids(self):
+        """Ids used by more than one source; exports list each of them more than once."""
+        return [i for (i,) in self.db.execute('SELECT id FROM products GROUP BY id '
+                                              'HAVING COUNT(*) > 1 ORDER BY id')]
+
+    @staticmethod
+    def _where(source, category):
+        clauses, params = [], []
+        if source is not None:
+            clauses.append('source = ?')
+            params.append(source)
+        if category is not None:
+            clauses.append('category = ?')
+            params.append(category)
+        return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+    def products(self, source=None, category=None):
+        """Iterate over the stored products in export order, one row at a time."""
+        for _, product in self.items(source, category):
+            yield product
+
+    def items(self, source=None, category=None):
+        """Like :meth:`products`, as ``(source, product)`` pairs."""
+        where, params = self._where(source, category)
+        for source, data in self.db.execute('SELECT source, data FROM products' + where + ORDER,
+                                            params):
+            yield source, json.loads(data)
+
+    def search(self, query, limit=20):
+        """Products matching the FTS5 ``query``, best match first."""
+        rows = self.db.execute(
+            'SELECT p.data FROM products_fts JOIN products p ON p.rowid = products_fts.rowid '
+            'WHERE products_fts MATCH ? ORDER BY bm25(products_fts, 3.0, 1.0) LIMIT ?',
+            (query, limit))
+        return [json.loads(data) for (data,) in rows]
+
+    def export_json(self, path, source=None, category=None):
+        """Write the products like ``json.dump(products, f, indent=2)``, without loading them all.
+
+        Returns the number of products written.
+        """
+        count = 0
+        with atomic_open(path) as f:
+            f.write('[')
+            for product in self.products(source, category):
+                text = json.dumps(product, indent=2).replace('\n', '\n  ')
+                f.write(('\n  ' if not count else ',\n  ') + text)
+                count += 1
+            f.write('\n]' if count else ']')
+        return count
+
+    def export_sharded(self, out_dir, source=None, **kwargs):
+        """:func:`~kanoha_import.shards.write_sharded` over the stored products, streamed.
+
+        One pass in export order writes the product files and the catalog
+        pages; a second, ordered by category, writes the category pages.
+        Neither holds more than a page of products.
+        """
+        writer = ShardWriter(out_dir, **kwargs)
+
+        def summaries():
+            for product in self.products(source):
+                writer.write_product(product)
+                yield list_record(product)
+
+        count, pages = writer.write_pages('all', summaries())
+        where, params = self._where(source, None)
+        rows = self.db.execute('SELECT data FROM products' + where + ' ORDER BY category, source, '
+                               'position', params)
+        by_category = itertools.groupby((list_record(json.loads(data)) for (data,) in rows),
+                                        key=lambda summary: summary['category'])
+        categories = writer.write_categories(by_category)
+        return writer.finish(count, pages, categories)
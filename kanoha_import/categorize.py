@@ -0,0 +1,114 @@
+"""Keyword categorization of product titles from a data-driven rule table."""
+import json
+import os
+import re
+
+RULES_FILE = os.path.join(os.path.dirname(__file__), 'category_rules.json')
+
+
+def _trie_pattern(words):
+    """Regex alternation for ``words`` factored into a prefix trie.
+
+    ``pan|pot|plug`` becomes ``p(?:an|lug|ot)``, so the regex engine follows
+    one path per character instead of retrying every keyword at each word.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{body})?" if '' in node else body
+
+    return build(trie)
+
+
+class Categorizer:
+    """Assign each title the first category whose keywords it contains.
+
+    ``rules`` is an ordered list of ``{"category": ..., "keywords": [...]}``.
+    Keywords match whole words, with an optional plural ``s``/``es``; a
+    trailing ``*`` turns a keyword into a word prefix (``cook*`` matches
+    "cookware"). All keywords are compiled into a single regex, so a title is
+    scanned once however many categories and keywords there are. When several
+    categories match, the one listed first wins.
+    """
+
+    def __init__(self, rules, default="General Merchandise"):
+        self.categories = [rule['category'] for rule in rules]
+        self.default = default
+        self._rank = {}
+        words, prefixes = [], []
+        for i, rule in enumerate(rules):
+            for keyword in rule['keywords']:
+                keyword = keyword.lower()
+                if keyword.endswith('*'):
+                    keyword = keyword[:-1]
+                    prefixes.append(keyword)
+                else:
+                    words.append(keyword)
+                self._rank.setdefault(keyword, i)
+        branches = []
+        if words:
+            branches.append(_trie_pattern(words) + r'(?=(?:e?s)?\b)')
+        if prefixes:
+            branches.append(_trie_pattern(prefixes))
+        # Matches only ever capture the keyword itself, which maps back to its rule
+        self.pattern = re.compile(r'\b(' + '|'.join(branches or ['(?!)']) + ')')
+        # Batches are one newline-separated text; a line break matches as ''
+        self._batch_pattern = re.compile(r'\n|' + self.pattern.pattern)
+
+    @classmethod
+    def from_file(cls, path=RULES_FILE):
+        with open(path, 'r') as f:
+            table = json.load(f)
+        return cls(table['rules'], table.get('default', "General Merchandise"))
+
+    def categorize(self, title):
+        rank = min(map(self._rank.__getitem__, self.pattern.findall(title.lower())), default=None)
+        return self.default if rank is None else self.categories[rank]
+
+    def categorize_many(self, titles):
+        """Categorize a batch of titles with a single scan over all of them."""
+        text = '\n'.join(titles).lower()
+        if text.count('\n') != len(titles) - 1:
+            # Some title has a line break of its own
+            return [self.categorize(title) for title in titles]
+        rank = self._rank.__getitem__
+        categories = self.categories + [self.default]
+        fallback = len(self.categories)
+        found = []
+        best = fallback
+        for keyword in self._batch_pattern.findall(text + '\n'):
+            if keyword:
+                r = rank(keyword)
+                if r < best:
+                    best = r
+            else:
+                found.append(categories[best])
+                best = fallback
+        return found
+
+
+_default = None
+
+
+def default_categorizer():
+    global _default
+    if _default is None:
+        _default = Categorizer.from_file()
+    return _default
+
+
+def categorize_product(title):
+    return default_categorizer().categorize(title)
+
+
+def categorize_many(titles):
+    return default_categorizer().categorize_many(titles)
@@ -0,0 +1,45 @@
+"""``clean``: drop products whose image is missing or broken."""
+import json
+
+from kanoha_import.catalog import CatalogStore
+from kanoha_import.paths import atomic_write_json
+from kanoha_import.validate import validate_products
+
+
+def run(paths, catalog=False):
+    if catalog:
+        # Only the bad rows are touched; the export is written atomically
+        with CatalogStore(paths.catalog_db) as store:
+            items = list(store.items())
+            valid_products = clean_products(paths, [p for _, p in items])
+            kept = {id(p) for p in valid_products}
+            store.delete((source, p['id']) for source, p in items if id(p) not in kept)
+            store.export_json(paths.data_file)
+    else:
+        with open(paths.data_file, 'r') as f:
+            products = json.load(f)
+        valid_products = clean_products(paths, products)
+        # Save cleaned products atomically, so a crash never leaves a half-written file
+        atomic_write_json(paths.data_file, valid_products, indent=2)
+
+    print("Successfully updated products.json")
+    return 0
+
+
+def clean_products(paths, products):
+    """The products whose image is usable; the others are reported."""
+    print(f"Total products before cleaning: {len(products)}")
+
+    # Drop products whose image is missing, empty, truncated or unreadable.
+    # The image URL in json is like "/images/products/filename.jpg", which lives
+    # at "client/public/images/products/filename.jpg"
+    valid_products, bad_entries = validate_products(products, paths.public_dir)
+    removed_count = len(bad_entries)
+
+    print(f"Removed {removed_count} products with missing or broken images.")
+    print(f"Total products after cleaning: {len(valid_products)}")
+
+    # Report what was removed and why
+    atomic_write_json(paths.clean_report_file, bad_entries, indent=2)
+    print(f"Report written to {paths.clean_report_file}")
+    return valid_products
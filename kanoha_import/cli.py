@@ -0,0 +1,130 @@
+"""Single entry point for the import commands.
+
+    python -m kanoha_import xml attachments --incremental --optimize --search-index --sharded
+    python -m kanoha_import xml products --replay
+    python -m kanoha_import scrape --crawl --pages 47
+    python -m kanoha_import clean --catalog
+    python -m kanoha_import publish
+
+Parsing the command line imports nothing but the standard library; the
+command's module, and whatever it needs (aiohttp, requests, Pillow...), is
+imported once it has been chosen. Options left out are not passed on, so
+their defaults are those of the command's ``run()``.
+"""
+import argparse
+import importlib
+
+from kanoha_import.compact import CONTAINERS
+from kanoha_import.metrics import PROFILERS
+from kanoha_import.paths import SITE_ROOT, XML_FILE, Paths
+
+# --dedupe: kanoha_import.dedupe.MODES, without importing NumPy to list them
+DEDUPE_MODES = ('flag', 'merge')
+
+
+def _command(subparsers, name, module, help, parents=()):
+    parser = subparsers.add_parser(name, help=help, description=help, parents=parents,
+                                   argument_default=argparse.SUPPRESS)
+    parser.set_defaults(command=module)
+    return parser
+
+
+def _add_download_options(parser):
+    parser.add_argument('--replay', action='store_true',
+                        help="work offline, using only images already on disk")
+    parser.add_argument('--max-age', type=float,
+                        help="trust images checked less than this many seconds ago without revalidating")
+
+
+def build_parser():
+    site = argparse.ArgumentParser(add_help=False)
+    site.add_argument('--root', default=SITE_ROOT,
+                      help=f"site checkout the catalog and images are written to (default: {SITE_ROOT})")
+    export = argparse.ArgumentParser(add_help=False, parents=[site])
+    export.add_argument('--xml-file', default=XML_FILE, help="WordPress WXR export to import")
+
+    parser = argparse.ArgumentParser(prog='python -m kanoha_import',
+                                     description="Build the storefront catalog.")
+    commands = parser.add_subparsers(dest='subcommand', metavar='COMMAND', required=True)
+    xml = commands.add_parser('xml', help="import a WordPress WXR export")
+    modes = xml.add_subparsers(dest='mode', metavar='MODE', required=True)
+
+    attachments = _command(modes, 'attachments', 'kanoha_import.xml_attachments',
+                           "import every attachment as a product", [export])
+    attachments.add_argument('--incremental', action='store_true',
+                             help="only rebuild items added, changed or deleted since the last import")
+    attachments.add_argument('--optimize', action='store_true',
+                             help="also write resized WebP variants and a srcset for each image (Pillow)")
+    attachments.add_argument('--avif', action='store_true',
+                             help="with --optimize, also emit AVIF variants (needs a Pillow build "
+                                  "with AVIF support)")
+    attachments.add_argument('--image-meta', action='store_true',
+                             help="also record each image's size, dominant color and a blurred "
+                                  "placeholder (Pillow)")
+    attachments.add_argument('--search-index', action='store_true',
+                             help="also write the prefix search index next to the products file")
+    attachments.add_argument('--sharded', action='store_true',
+                             help="also write a manifest with per-category, per-page and per-product shards")
+    _add_download_options(attachments)
+    attachments.add_argument('--metrics-textfile',
+                             help="also write the run metrics here for the node_exporter textfile collector")
+    attachments.add_argument('--profile', choices=PROFILERS,
+                             help="profile each stage; cProfile dumps go to .import-cache/profiles/")
+    attachments.add_argument('--parse-workers', type=int,
+                             help="parse the export on this many processes (0: one per CPU)")
+    attachments.add_argument('--compact', action='append', choices=CONTAINERS,
+                             help="also write a dictionary-encoded products.compact.<format>; repeatable")
+    attachments.add_argument('--dedupe', choices=DEDUPE_MODES,
+                             help="find near-duplicate images and flag (duplicateOf) or merge the products")
+    attachments.add_argument('--catalog', action='store_true',
+                             help="keep the products in .import-cache/catalog.sqlite and export "
+                                  "products.json from it")
+    attachments.add_argument('--publish', action='store_true',
+                             help="finish with the publish stage (see the publish command)")
+
+    products = _command(modes, 'products', 'kanoha_import.xml_products',
+                        "import products with their thumbnail image", [export])
+    _add_download_options(products)
+
+    scrape = _command(commands, 'scrape', 'kanoha_import.scrape',
+                      "scrape products from the storefront's shop pages", [site])
+    scrape.add_argument('--pages', type=int, help="shop pages to scrape (default: 5)")
+    scrape.add_argument('--base-url', help="shop page URL template with {} for the page number")
+    scrape.add_argument('--crawl', action='store_true',
+                        help="fetch pages concurrently under a rate limit, pipelining image downloads")
+    scrape.add_argument('--rate', type=float, help="page requests per second (default: 0.5)")
+    scrape.add_argument('--pages-in-flight', type=int)
+    scrape.add_argument('--image-workers', type=int)
+    scrape.add_argument('--cache-dir', help="where shop page responses are cached")
+    scrape.add_argument('--cache-ttl', type=float,
+                        help="seconds a cached page or checked image is used without revalidating")
+    cache_mode = scrape.add_mutually_exclusive_group()
+    cache_mode.add_argument('--refresh', action='store_true',
+                            help="revalidate every cached page and image")
+    cache_mode.add_argument('--replay', action='store_true',
+                            help="work offline from the cache and images already on disk")
+    scrape.add_argument('--catalog', action='store_true',
+                        help="keep the products in .import-cache/catalog.sqlite and export "
+                             "products.json from it")
+
+    clean = _command(commands, 'clean', 'kanoha_import.clean',
+                     "drop products whose image is missing or broken", [site])
+    clean.add_argument('--catalog', action='store_true',
+                       help="clean the products in .import-cache/catalog.sqlite and export "
+                            "products.json from it")
+
+    publish = _command(commands, 'publish', 'kanoha_import.publish',
+                       "copy images to content-hashed /static/ URLs, write the asset manifest "
+                       "and precompress text files", [site])
+    publish.add_argument('--workers', type=int, help="compression processes (default: one per CPU)")
+    return parser
+
+
+def main(argv=None):
+    """Run the command in ``argv``; returns its exit status."""
+    options = vars(build_parser().parse_args(argv))
+    for key in ('subcommand', 'mode'):
+        options.pop(key, None)
+    module = importlib.import_module(options.pop('command'))
+    paths = Paths(options.pop('root'), options.pop('xml_file', XML_FILE))
+    return module.run(paths, **options)
@@ -0,0 +1,240 @@
+"""Compact, dictionary-encoded catalog format with a lossless reader.
+
+``encode(products)`` turns the ``products.json`` list into::
+
+    {"format": "kanoha-catalog", "version": 1,
+     "fields": ["id", "name", "price", ...],     # key order of the records
+     "prefixes": {"img": "/images/products/"},   # stripped from every value
+     "templated": ["description", "srcset"],     # may contain {name}/{stem}
+     "tables": {"price": ["Contact for Price"], "features": [[...], ...]},
+     "count": 601, "columns": {"id": ["65", ...], "price": [0, ...], ...},
+     "nulls": {"name": [17]}}
+
+Each column holds one cell per record: an index into ``tables`` for interned
+fields, the value itself otherwise, or null where the record lacks the key.
+A value that really is null is interned like any other, except in the plain
+fields, which list the records holding one in ``nulls``.
+In templated fields ``{name}`` stands for the record's name and ``{stem}``
+for its image file name without extension, so "High-quality {name}
+available for wholesale." is stored once for the whole catalog; a value
+that cannot be templated safely is kept as ``{"raw": value}``.
+
+``decode`` rebuilds the original records exactly, with their keys in order
+of first appearance across the catalog. ``write_compact`` and
+``read_compact`` choose the container from the file name: ``.json``
+(minified), ``.msgpack`` (needs the ``msgpack`` package), each optionally
+with ``.gz``.
+"""
+import gzip
+import json
+import os
+import re
+
+from kanoha_import.paths import atomic_open
+
+FORMAT = 'kanoha-catalog'
+VERSION = 1
+# Fields that are always stored verbatim; templates are filled in from them
+PLAIN_FIELDS = ('id', 'name', 'img')
+# A field is interned when it has at most this share of distinct values
+INTERN_RATIO = 0.5
+MIN_PREFIX = 4
+# File name suffixes write_compact() and read_compact() understand
+CONTAINERS = ('json', 'json.gz', 'msgpack', 'msgpack.gz')
+
+
+def _stem(img):
+    # Image file name without its extension
+    if not isinstance(img, str):
+        return None
+    name = img.rpartition('/')[2]
+    return name.rpartition('.')[0] or name
+
+
+def _name(name):
+    # Only a string name can stand in for {name}
+    return name if isinstance(name, str) else None
+
+
+def _placeholders(record):
+    return _name(record.get('name')), _stem(record.get('img'))
+
+
+def _fill(template, name, stem):
+    # Always in this order; encoding checks that it reproduces the value
+    if '{' not in template:
+        return template
+    if stem is not None:
+        template = template.replace('{stem}', stem)
+    if name is not None:
+        template = template.replace('{name}', name)
+    return template
+
+
+def _template(value, name, stem):
+    """``value`` with placeholders substituted in, or None if it would not round-trip."""
+    if '{' in value:
+        return None
+    template = value
+    # Longest first, so a name inside the stem (or vice versa) is not split.
+    # Only whole tokens are replaced: a product named "6" must not turn
+    # "640w" into "{name}40w".
+    for key, sub in sorted((('{name}', name), ('{stem}', stem)), key=lambda kv: -len(kv[1] or '')):
+        if isinstance(sub, str) and sub:
+            pattern = r'(?<![A-Za-z0-9])' + re.escape(sub) + r'(?![A-Za-z0-9])'
+            template = re.sub(pattern, lambda m: key, template)
+    return template if _fill(template, name, stem) == value else None
+
+
+def _key(value):
+    # Hashable identity for lists and dicts, so they can be interned too
+    return json.dumps(value, sort_keys=True) if isinstance(value, (list, dict)) else (type(value).__name__, value)
+
+
+def encode(products):
+    """Dictionary-encode a list of product records; see the module docstring."""
+    fields = list(dict.fromkeys(k for p in products for k in p))
+    placeholders = [_placeholders(p) for p in products]
+    missing = object()
+
+    columns = {}
+    templated = []
+    prefixes = {}
+    for field in fields:
+        values = [p.get(field, missing) for p in products]
+        if field not in PLAIN_FIELDS and any(isinstance(v, str) for v in values):
+            encoded = []
+            for value, (name, stem) in zip(values, placeholders):
+                if isinstance(value, str):
+                    template = _template(value, name, stem)
+                    value = template if template is not None else {'raw': value}
+                elif isinstance(value, dict):
+                    value = {'raw': value}
+                encoded.append(value)
+            if any(isinstance(v, str) and v != orig for v, orig in zip(encoded, values)):
+                templated.append(field)
+                values = encoded
+        strings = [v for v in values if isinstance(v, str)]
+        if field in PLAIN_FIELDS and strings and len(strings) == len(values):
+            prefix = os.path.commonprefix(strings)
+            if len(prefix) >= MIN_PREFIX:
+                prefixes[field] = prefix
+                values = [v[len(prefix):] for v in values]
+        columns[field] = values
+
+    tables = {}
+    encoded = {}
+    nulls = {}
+    for field in fields:
+        values = columns[field]
+        present = [v for v in values if v is not missing]
+        distinct = {}
+        for value in present:
+            distinct.setdefault(_key(value), value)
+        # A None value must be interned, so that a null cell can only mean "missing"
+        intern = (field not in PLAIN_FIELDS and present and
+                  (len(distinct) <= len(present) * INTERN_RATIO or any(v is None for v in present)))
+        if intern:
+            index = {key: i for i, key in enumerate(distinct)}
+            tables[field] = list(distinct.values())
+            values = [index[_key(v)] if v is not missing else None for v in values]
+        else:
+            if any(v is None for v in values):
+                nulls[field] = [i for i, v in enumerate(values) if v is None]
+            values = [v if v is not missing else None for v in values]
+        encoded[field] = values
+
+    return {'format': FORMAT, 'version': VERSION, 'count': len(products), 'fields': fields,
+            'prefixes': prefixes, 'templated': templated, 'tables': tables, 'columns': encoded,
+            'nulls': nulls}
+
+
+def decode(doc):
+    """Rebuild the product records from :func:`encode` output."""
+    if doc.get('format') != FORMAT or doc.get('version') != VERSION:
+        raise ValueError(f"not a {FORMAT} v{VERSION} document")
+    fields = doc['fields']
+    count = doc['count']
+    nulls = doc.get('nulls', {})
+    columns = {}
+    holes = {}
+    for field in fields:
+        cells = doc['columns'][field]
+        if None in cells:
+            kept = set(nulls.get(field, ()))
+            holes[field] = [i for i, cell in enumerate(cells) if cell is None and i not in kept]
+        table = doc['tables'].get(field)
+        if table is not None:
+            cells = [table[i] if i is not None else None for i in cells]
+        prefix = doc['prefixes'].get(field)
+        if prefix is not None:
+            cells = [prefix + v for v in cells]
+        columns[field] = cells
+
+    names = [_name(name) for name in columns.get('name') or [None] * count]
+    stems = None
+    for field in doc['templated']:
+        cells = columns[field]
+        if stems is None and any(isinstance(v, str) and '{stem}' in v for v in cells):
+            stems = [_stem(img) for img in columns.get('img') or [None] * count]
+        if stems is None:
+            # Only {name}: the common case, kept to one replace per record
+            columns[field] = [
+                (v.replace('{name}', name) if name is not None and '{' in v else v) if type(v) is str
+                else v['raw'] if isinstance(v, dict) else v
+                for v, name in zip(cells, names)]
+        else:
+            columns[field] = [
+                _fill(v, name, stem) if type(v) is str else v['raw'] if isinstance(v, dict) else v
+                for v, name, stem in zip(cells, names, stems)]
+
+    products = [dict(zip(fields, values)) for values in zip(*(columns[f] for f in fields))]
+    # Null cells are keys the record did not have
+    for field, positions in holes.items():
+        for i in positions:
+            del products[i][field]
+    return products
+
+
+def dumps(products, binary=False):
+    """Serialized compact catalog: minified JSON text, or MessagePack bytes."""
+    doc = encode(products)
+    if binary:
+        import msgpack
+        return msgpack.packb(doc, use_bin_type=True)
+    return json.dumps(doc, separators=(',', ':'), ensure_ascii=False)
+
+
+def loads(data, binary=False):
+    if binary:
+        import msgpack
+        return decode(msgpack.unpackb(data, raw=False, strict_map_key=False))
+    return decode(json.loads(data))
+
+
+def _container(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    return name.endswith('.msgpack'), path.endswith('.gz')
+
+
+def write_compact(products, path):
+    """Write ``products`` to ``path`` (.json, .msgpack, optionally .gz); returns its size."""
+    binary, compressed = _container(path)
+    data = dumps(products, binary)
+    if not binary:
+        data = data.encode('utf-8')
+    if compressed:
+        data = gzip.compress(data, compresslevel=9, mtime=0)
+    with atomic_open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+
+def read_compact(path):
+    """Products from a file written by :func:`write_compact`."""
+    binary, compressed = _container(path)
+    with open(path, 'rb') as f:
+        data = f.read()
+    if compressed:
+        data = gzip.decompress(data)
+    return loads(data if binary else data.decode('utf-8'), binary)
@@ -0,0 +1,185 @@
+"""Concurrent, rate-limited storefront crawler with pipelined image fetches."""
+import asyncio
+import os
+import time
+
+import aiohttp
+
+from kanoha_import.downloader import fetch_retrying, offline_result
+from kanoha_import.paths import PLACEHOLDER
+from kanoha_import.retry import RetryScheduler
+
+
+class TokenBucket:
+    """Allow ``rate`` requests per second on average, with bursts of ``burst``."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+async def crawl_async(page_urls, parse_page, make_product, image_dir, rate=0.5, burst=1,
+                      pages_in_flight=4, image_workers=8, headers=None, manifest=None,
+                      page_timeout=15, read_timeout=30, cache=None, max_age=None, retry=None):
+    """Crawl ``page_urls`` and download every product image found on them.
+
+    Page requests go through a token bucket (``rate``/``burst``) with at most
+    ``pages_in_flight`` outstanding. ``parse_page(html)`` runs in a worker
+    thread and returns raw items; ``make_product(item, product_id)`` returns
+    ``(product, image_url, filename)``. Images are queued to a separate pool
+    of ``image_workers`` as soon as their page is parsed, so downloads overlap
+    with the remaining page fetches.
+
+    Pages are numbered in the order given regardless of which finishes first,
+    so product ids come out exactly as in a sequential crawl. Returns the
+    products; those whose image failed point at the placeholder unless a copy
+    from a previous run is on disk. A page that fails to load or parse is
+    reported and skipped, as in the sequential scrape; an image worker that
+    dies stops the whole crawl.
+
+    With a :class:`~kanoha_import.httpcache.ResponseCache`, fresh pages are
+    served from it without spending a token, stale ones are revalidated, and
+    in replay mode nothing goes to the network: images come from disk only.
+    ``max_age`` skips revalidating images the manifest checked more recently.
+
+    Image downloads are retried by ``retry`` (a
+    :class:`~kanoha_import.retry.RetryScheduler`); those still failing
+    transiently are tried once more after the last page, before an image
+    falls back to the placeholder.
+    """
+    bucket = TokenBucket(rate, burst)
+    if retry is None:
+        retry = RetryScheduler()
+    image_slots = asyncio.Semaphore(image_workers)
+    page_slots = asyncio.Semaphore(pages_in_flight)
+    images = asyncio.Queue(maxsize=image_workers * 4)
+    products = []
+    failed_pages = []
+
+    connector = aiohttp.TCPConnector(limit=pages_in_flight + image_workers)
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=read_timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                     headers=headers) as session:
+
+        async def download(product, url, path, defer):
+            if cache is not None and cache.mode == 'replay':
+                result = offline_result(url, path)
+            else:
+                result = await fetch_retrying(session, url, path, manifest, max_age,
+                                              retry, image_slots)
+            if result.transient and defer:
+                retry.defer((product, url, path))
+            elif not result.ok:
+                print(f"Error downloading {url}: {result.error}")
+                if not (os.path.exists(path) and os.path.getsize(path) > 0):
+                    product['img'] = PLACEHOLDER
+            return result
+
+        async def image_worker():
+            while True:
+                product, url, path = await images.get()
+                try:
+                    await download(product, url, path, defer=True)
+                finally:
+                    images.task_done()
+
+        async def load_page(url):
+            try:
+                html = await fetch_page(url)
+                return await asyncio.to_thread(parse_page, html) if html is not None else None
+            except Exception as e:
+                print(f"Error scraping {url}: {e}")
+                return None
+
+        async def fetch_page(url):
+            entry = cache.load(url) if cache is not None else None
+            if entry is not None and cache.is_fresh(entry):
+                cache.hits += 1
+                return cache.response(entry).text
+            if cache is not None and cache.mode == 'replay':
+                print(f"Error scraping {url}: not in the cache (replay mode)")
+                return None
+            async with page_slots:
+                await bucket.acquire()
+                try:
+                    async with session.get(url, headers=cache.validators(entry) if entry else None,
+                                           timeout=aiohttp.ClientTimeout(total=page_timeout)) as response:
+                        if response.status == 304 and entry is not None:
+                            cache.revalidated += 1
+                            entry = cache.touch(url, entry, response.headers)
+                            html = cache.response(entry).text
+                        elif response.status != 200:
+                            print(f"Failed to load {url}: Status {response.status}")
+                            return None
+                        else:
+                            body = await response.read()
+                            html = await response.text()
+                            if cache is not None:
+                                cache.fetched += 1
+                                cache.store(url, response.status, response.headers, body)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    print(f"Error scraping {url}: {e}")
+                    return None
+            return html
+
+        async def read_pages():
+            # Consume pages in order; later pages keep downloading meanwhile
+            for page_no, (url, page) in enumerate(zip(page_urls, pages), 1):
+                items = await page
+                if items is None:
+                    failed_pages.append(url)
+                    continue
+                print(f"Found {len(items)} items on page {page_no}")
+                for item in items:
+                    product, image_url, filename = make_product(item, str(len(products) + 1))
+                    products.append(product)
+                    if image_url:
+                        await images.put((product, image_url, os.path.join(image_dir, filename)))
+                    else:
+                        product['img'] = PLACEHOLDER
+            await images.join()
+
+        workers = [asyncio.create_task(image_worker()) for _ in range(image_workers)]
+        pages = [asyncio.create_task(load_page(url)) for url in page_urls]
+        reader = asyncio.create_task(read_pages())
+        try:
+            # Image workers only return by failing; the reader would then wait
+            # on a full queue forever
+            await asyncio.wait([reader] + workers, return_when=asyncio.FIRST_COMPLETED)
+            for task in workers:
+                if task.done():
+                    reader.cancel()
+                    task.result()
+            await reader
+            if failed_pages:
+                print(f"Skipped {len(failed_pages)} pages that failed to load or parse")
+            deferred = retry.take_deferred()
+            if deferred:
+                print(f"Retrying {len(deferred)} images after the main pass...")
+                await asyncio.sleep(retry.breaker.wait_time())
+                retried = await asyncio.gather(*(download(*item, defer=False) for item in deferred))
+                retry.recovered += sum(result.ok for result in retried)
+        finally:
+            for task in workers + pages + [reader]:
+                task.cancel()
+            await asyncio.gather(*workers, *pages, reader, return_exceptions=True)
+    return products
+
+
+def crawl(page_urls, parse_page, make_product, image_dir, **kwargs):
+    """Blocking wrapper around :func:`crawl_async`."""
+    return asyncio.run(crawl_async(page_urls, parse_page, make_product, image_dir, **kwargs))
@@ -0,0 +1,219 @@
+"""Near-duplicate product images by perceptual hash.
+
+Each image is reduced to a 64-bit difference hash (dHash: the picture
+shrunk to 9x8 grey pixels, one bit per pair of horizontal neighbours). It
+survives resizing and re-encoding, so re-uploads and size variants of one
+photo land within a few bits of each other. Hashes are cached in
+``state_file`` by file size and mtime.
+
+Candidates are found by multi-index hashing: the hash is cut into
+``max_distance + 1`` bands, and two hashes at most ``max_distance`` bits
+apart agree exactly on at least one of them. Only hashes sharing a band
+value are compared, with NumPy doing the XOR and popcount, so the search
+stays far from quadratic at 100k+ images.
+
+A grey 9x8 hash says little about photos of small objects on a white
+background, so every candidate pair is confirmed on a colour thumbnail of
+both images (see :func:`same_picture`) before it counts. Matches are not
+chained: a duplicate must match the image it is a duplicate of.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from kanoha_import.paths import IMAGE_URL, PLACEHOLDER, atomic_write_json, load_json
+
+HASH_BITS = 64
+MAX_DISTANCE = 2
+MODES = ('flag', 'merge')
+# same_picture(): thumbnail side, and how far apart two copies of a photo may be
+CONFIRM_SIZE = 64
+MAX_ASPECT_DIFFERENCE = 0.02
+PIXEL_TOLERANCE = 32
+MAX_CHANGED_PIXELS = 0.001
+
+if hasattr(np, 'bitwise_count'):
+    _popcount = np.bitwise_count
+else:
+    _POPCOUNT8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def _popcount(values):
+        return _POPCOUNT8[values.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+def dhash(path):
+    """``(hash, pixel_count)`` for one image; runs in a worker process."""
+    with Image.open(path) as im:
+        pixels = im.width * im.height
+        # Let JPEG decode at a reduced scale; only 9x8 pixels are needed
+        im.draft('L', (72, 64))
+        grey = np.asarray(im.convert('L').resize((9, 8), Image.LANCZOS), dtype=np.int16)
+    bits = np.packbits(grey[:, 1:] > grey[:, :-1])
+    return int.from_bytes(bits.tobytes(), 'big'), pixels
+
+
+def _thumbnail(path):
+    with Image.open(path) as im:
+        aspect = im.width / im.height
+        im.draft('RGB', (2 * CONFIRM_SIZE, 2 * CONFIRM_SIZE))
+        rgb = im.convert('RGB').resize((CONFIRM_SIZE, CONFIRM_SIZE), Image.LANCZOS)
+        return aspect, np.asarray(rgb, dtype=np.int16)
+
+
+def same_picture(a, b):
+    """True if the images at ``a`` and ``b`` are copies of one photo; runs in a worker process.
+
+    Their aspect ratios must agree, and hardly any pixel of their colour
+    thumbnails may differ by more than re-encoding and resizing would.
+    """
+    (aspect_a, rgb_a), (aspect_b, rgb_b) = _thumbnail(a), _thumbnail(b)
+    if abs(aspect_a - aspect_b) > MAX_ASPECT_DIFFERENCE * max(aspect_a, aspect_b):
+        return False
+    changed = np.abs(rgb_a - rgb_b).max(axis=2) > PIXEL_TOLERANCE
+    return changed.mean() <= MAX_CHANGED_PIXELS
+
+
+def near_pairs(hashes, max_distance=MAX_DISTANCE):
+    """Index pairs ``(i, j)``, ``i < j``, of hashes at most ``max_distance`` bits apart."""
+    if not 0 <= max_distance < HASH_BITS:
+        raise ValueError(f"max_distance must be between 0 and {HASH_BITS - 1}")
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    n = len(hashes)
+    edges = np.linspace(0, HASH_BITS, max_distance + 2).astype(int)
+    found = []
+    for low, high in zip(edges[:-1], edges[1:]):
+        keys = (hashes >> np.uint64(low)) & np.uint64((1 << (high - low)) - 1)
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        # Within a run of equal keys, pair every element with the one k places on
+        candidates = np.arange(n)
+        k = 1
+        while True:
+            candidates = candidates[candidates + k < n]
+            candidates = candidates[keys[candidates] == keys[candidates + k]]
+            if not candidates.size:
+                break
+            a, b = order[candidates], order[candidates + k]
+            close = _popcount(hashes[a] ^ hashes[b]) <= max_distance
+            found.append(np.stack([np.minimum(a, b)[close], np.maximum(a, b)[close]], axis=1))
+            k += 1
+    if not found:
+        return np.empty((0, 2), dtype=np.int64)
+    return np.unique(np.concatenate(found), axis=0)
+
+
+def _groups(ranked, pairs):
+    # In rank order, each image not yet taken keeps the untaken images it matches itself
+    matches = {}
+    for i, j in pairs:
+        matches.setdefault(i, []).append(j)
+        matches.setdefault(j, []).append(i)
+    rank = {i: n for n, i in enumerate(ranked)}
+    taken = set()
+    groups = []
+    for i in ranked:
+        if i in taken:
+            continue
+        members = sorted((j for j in matches.get(i, ()) if j not in taken), key=rank.get)
+        if members:
+            taken.update(members)
+            groups.append([i] + members)
+    return groups
+
+
+def _confirmed(sources, pairs, workers):
+    if not len(pairs):
+        return []
+    pairs = pairs.tolist()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        same = executor.map(same_picture, [sources[i] for i, _ in pairs],
+                            [sources[j] for _, j in pairs], chunksize=16)
+        return [pair for pair, ok in zip(pairs, same) if ok]
+
+
+def _load_hashes(sources, state_file, workers):
+    state = load_json(state_file, {})
+    new_state = {}
+    jobs = []
+    for source in sources:
+        st = os.stat(source)
+        entry = state.get(source)
+        if entry and (entry['size'], entry['mtime_ns']) == (st.st_size, st.st_mtime_ns):
+            new_state[source] = entry
+        else:
+            jobs.append((source, st))
+    failed = 0
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(dhash, source) for source, _ in jobs]
+            for (source, st), future in zip(jobs, futures):
+                try:
+                    value, pixels = future.result()
+                except Exception as e:
+                    print(f"Error hashing {source}: {e}")
+                    failed += 1
+                    continue
+                new_state[source] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+                                     'dhash': f"{value:016x}", 'pixels': pixels}
+
+    atomic_write_json(state_file, new_state)
+    return new_state, len(jobs) - failed
+
+
+def dedupe_products(products, image_dir, state_file, mode='flag', max_distance=MAX_DISTANCE,
+                    workers=None, url_prefix=IMAGE_URL):
+    """Find products whose local images are near-duplicates of each other.
+
+    Only downloaded images count: products on the placeholder, or whose
+    file is missing, are never duplicates. In each group the product with
+    the largest image (the first one on a tie) is kept. With
+    ``mode='flag'`` the others get ``duplicateOf`` set to its id; with
+    ``mode='merge'`` they are left out, keeping ``duplicateOf``.
+
+    Returns the products, the number of duplicates and, when merging, the
+    image files only merged products used. Nothing is deleted here; the
+    caller removes those once the merged catalog is saved.
+    """
+    if mode not in MODES:
+        raise ValueError(f"unknown dedupe mode {mode!r}, expected one of {MODES}")
+    by_source = {}
+    for product in products:
+        product.pop('duplicateOf', None)
+        img = product.get('img') or ''
+        if img.startswith(url_prefix) and img != PLACEHOLDER:
+            source = os.path.join(image_dir, img[len(url_prefix):])
+            if os.path.exists(source):
+                by_source.setdefault(source, []).append(product)
+
+    entries, hashed = _load_hashes(list(by_source), state_file, workers)
+    sources = [s for s in by_source if s in entries]
+    hashes = [int(entries[s]['dhash'], 16) for s in sources]
+    pairs = _confirmed(sources, near_pairs(hashes, max_distance), workers)
+    # Largest image first; sources are in catalog order, so ties keep the first
+    ranked = sorted(range(len(sources)), key=lambda i: (-entries[sources[i]]['pixels'], i))
+    groups = _groups(ranked, pairs)
+    # Products sharing one file are duplicates whatever its hash
+    grouped = {i for group in groups for i in group}
+    groups += [[i] for i, s in enumerate(sources) if len(by_source[s]) > 1 and i not in grouped]
+
+    duplicates = set()
+    for group in groups:
+        members = [p for i in group for p in by_source[sources[i]]]
+        keep = members[0]
+        for product in members[1:]:
+            product['duplicateOf'] = keep['id']
+            duplicates.add(id(product))
+
+    print(f"Hashed {hashed} images; {len(duplicates)} products duplicate another "
+          f"in {len(groups)} groups.")
+    unused = []
+    if mode == 'merge':
+        products = [p for p in products if id(p) not in duplicates]
+        for product in products:
+            product.pop('duplicateOf', None)
+        unused = [source for source, members in by_source.items()
+                  if all(id(p) in duplicates for p in members)]
+        print(f"Merged {len(duplicates)} products.")
+    return products, len(duplicates), unused
@@ -0,0 +1,163 @@
+"""Asyncio image download engine with pooled keep-alive connections."""
+import asyncio
+import os
+from dataclasses import dataclass
+
+import aiohttp
+
+from kanoha_import.partial import IncompleteDownload, PartialDownload
+from kanoha_import.retry import RETRY_STATUSES, RetryScheduler, host_of, retry_after_seconds
+
+CHUNK_SIZE = 256 * 1024
+WRITE_BUFFER = 1024 * 1024
+
+
+@dataclass
+class DownloadResult:
+    url: str
+    path: str
+    ok: bool
+    status: int = None
+    error: str = None
+    size: int = 0
+    skipped: bool = False
+    # Worth trying again later (network error, 429, 5xx...)
+    transient: bool = False
+    retry_after: float = None
+
+
+def offline_result(url, path):
+    """Outcome for ``url`` without touching the network: whatever is on disk."""
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        return DownloadResult(url, path, True, size=os.path.getsize(path), skipped=True)
+    return DownloadResult(url, path, False, error="not available offline")
+
+
+async def fetch(session, url, path, manifest=None, max_age=None):
+    """Download ``url`` to ``path`` and describe the outcome; never raises.
+
+    With a :class:`~kanoha_import.manifest.DownloadManifest` the request is
+    conditional and a 304 leaves the local file untouched, and a file checked
+    less than ``max_age`` seconds ago is not requested at all; without one an
+    existing non-empty file is simply kept. ``path`` is only ever replaced by
+    a complete body; an interrupted transfer is resumed with a Range request
+    on the next call (see :mod:`kanoha_import.partial`).
+    """
+    if not url:
+        return DownloadResult(url, path, False, error="missing url")
+
+    if manifest is not None and manifest.is_fresh(url, path, max_age):
+        return DownloadResult(url, path, True, size=os.path.getsize(path), skipped=True)
+    if manifest is None and os.path.exists(path) and os.path.getsize(path) > 0:
+        return DownloadResult(url, path, True, size=os.path.getsize(path), skipped=True)
+
+    download = PartialDownload(url, path, buffering=WRITE_BUFFER)
+    for attempt in range(2):
+        resume = download.resume_headers()
+        headers = resume
+        if not resume and manifest is not None:
+            headers = manifest.conditional_headers(url, path)
+        started = False
+        try:
+            async with session.get(url, headers=headers) as response:
+                if response.status == 416 and resume and attempt == 0:
+                    # The .part no longer lines up with the origin's file: start over
+                    download.discard()
+                    continue
+                if response.status == 304 and manifest is not None:
+                    manifest.record(url, path, response.headers)
+                    return DownloadResult(url, path, True, status=304,
+                                          size=os.path.getsize(path), skipped=True)
+                if response.status not in (200, 206):
+                    return DownloadResult(
+                        url, path, False, status=response.status, error=f"HTTP {response.status}",
+                        transient=response.status in RETRY_STATUSES,
+                        retry_after=retry_after_seconds(response.headers.get('Retry-After')))
+                started = True
+                download.begin(response.status, response.headers)
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    download.write(chunk)
+                size, sha256 = download.finish()
+                if manifest is not None:
+                    manifest.record(url, path, response.headers, size, sha256)
+                return DownloadResult(url, path, True, status=response.status, size=size)
+        except (aiohttp.ClientError, asyncio.TimeoutError, IncompleteDownload, OSError) as e:
+            # Keep what arrived for a Range request next time, if the origin allows it
+            if started:
+                download.abort()
+            return DownloadResult(url, path, False, error=f"{type(e).__name__}: {e}",
+                                  transient=True)
+
+
+async def fetch_retrying(session, url, path, manifest, max_age, retry, slots):
+    """:func:`fetch` under ``retry``'s backoff and circuit breaker.
+
+    Each attempt holds one of ``slots`` (an ``asyncio.Semaphore``), taken
+    before the circuit is checked, so requests to a failing host neither queue
+    up in the connector nor keep slots busy while they back off.
+    """
+    host = host_of(url)
+    for attempt in range(retry.attempts):
+        async with slots:
+            if not retry.breaker.allow(host):
+                retry.short_circuited += 1
+                return DownloadResult(url, path, False, error=f"CircuitOpen: circuit open for {host}",
+                                      transient=True)
+            result = await fetch(session, url, path, manifest, max_age)
+        if not result.transient:
+            # Even a 404 shows the host is up
+            retry.breaker.success(host)
+            return result
+        retry.breaker.failure(host)
+        if attempt + 1 < retry.attempts:
+            retry.retries += 1
+            await asyncio.sleep(retry.delay(attempt, result.retry_after))
+    return result
+
+
+def open_session(limit=32, per_host=8, connect_timeout=10, read_timeout=30, headers=None):
+    """``aiohttp.ClientSession`` with pooled keep-alive connections, for use with ``async with``."""
+    connector = aiohttp.TCPConnector(limit=limit, limit_per_host=per_host,
+                                     ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=connect_timeout,
+                                    sock_read=read_timeout)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers)
+
+
+async def download_all_async(tasks, limit=32, per_host=8, connect_timeout=10,
+                             read_timeout=30, headers=None, manifest=None, max_age=None,
+                             retry=None):
+    """Download ``(url, path)`` pairs over one pooled session.
+
+    ``limit`` caps connections in flight overall and ``per_host`` per origin;
+    connections are kept alive and reused between requests. Transient
+    failures are retried by ``retry`` (a
+    :class:`~kanoha_import.retry.RetryScheduler`, a default one if None), and
+    those left over once every task has finished get one more try after the
+    open circuits cool down. Results are returned in the order of ``tasks``.
+    """
+    if retry is None:
+        retry = RetryScheduler()
+    slots = asyncio.Semaphore(limit)
+    async with open_session(limit, per_host, connect_timeout, read_timeout, headers) as session:
+        results = await asyncio.gather(*(fetch_retrying(session, url, path, manifest, max_age,
+                                                        retry, slots)
+                                         for url, path in tasks))
+        for i, result in enumerate(results):
+            if result.transient:
+                retry.defer(i)
+        deferred = retry.take_deferred()
+        if deferred:
+            await asyncio.sleep(retry.breaker.wait_time())
+            retried = await asyncio.gather(*(fetch_retrying(session, *tasks[i], manifest, max_age,
+                                                            retry, slots)
+                                             for i in deferred))
+            for i, result in zip(deferred, retried):
+                retry.recovered += result.ok
+                results[i] = result
+        return results
+
+
+def download_all(tasks, **kwargs):
+    """Blocking wrapper around :func:`download_all_async`."""
+    return asyncio.run(download_all_async(tasks, **kwargs))
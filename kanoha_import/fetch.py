@@ -0,0 +1,124 @@
+"""Blocking image fetches shared by the requests-based commands."""
+import os
+import time
+
+from kanoha_import.partial import PartialDownload
+from kanoha_import.paths import IMAGE_URL, PLACEHOLDER
+from kanoha_import.retry import RETRY_STATUSES, TRANSIENT_ERRORS, RetryableStatus, retry_after_seconds
+
+CHUNK_SIZE = 256 * 1024
+
+
+def fetch_image(session, url, local_path, manifest, max_age=None, **kwargs):
+    """Fetch ``url`` into ``local_path`` unless the origin reports it unchanged.
+
+    ``session`` is a ``requests.Session`` or the ``requests`` module itself;
+    extra keyword arguments go to ``session.get``. Returns True when
+    ``local_path`` holds the current file (fresh 200 or a 304) and False for
+    any other status, except those worth retrying (429, 5xx...) which raise
+    :class:`~kanoha_import.retry.RetryableStatus`. Network errors propagate to
+    the caller. A file the
+    manifest checked less than ``max_age`` seconds ago is trusted without
+    asking the origin at all.
+
+    The body is written through a :class:`~kanoha_import.partial.PartialDownload`:
+    ``local_path`` is replaced only by a complete file, and an interrupted
+    transfer is resumed with a Range request next time.
+    """
+    if manifest.is_fresh(url, local_path, max_age):
+        return True
+    base_headers = kwargs.pop('headers', None) or {}
+    download = PartialDownload(url, local_path)
+    resume = download.resume_headers()
+    headers = dict(base_headers)
+    headers.update(resume or manifest.conditional_headers(url, local_path))
+
+    response = session.get(url, headers=headers, stream=True, **kwargs)
+    with response:
+        if response.status_code == 416 and resume:
+            # The .part no longer lines up with the origin's file: start over
+            download.discard()
+            return fetch_image(session, url, local_path, manifest, headers=base_headers, **kwargs)
+        if response.status_code == 304:
+            manifest.record(url, local_path, response.headers)
+            return True
+        if response.status_code in RETRY_STATUSES:
+            raise RetryableStatus(response.status_code,
+                                  retry_after_seconds(response.headers.get('Retry-After')))
+        if response.status_code not in (200, 206):
+            return False
+
+        try:
+            download.begin(response.status_code, response.headers)
+            for chunk in response.iter_content(CHUNK_SIZE):
+                download.write(chunk)
+            length, sha256 = download.finish()
+        except BaseException:
+            download.abort()
+            raise
+    manifest.record(url, local_path, response.headers, length, sha256)
+    return True
+
+
+def _on_disk(path):
+    return os.path.exists(path) and os.path.getsize(path) > 0
+
+
+class ImageFetcher:
+    """Download product images into ``image_dir`` and return their ``img`` URL.
+
+    A failed download falls back to the copy from a previous run, if any, and
+    then to the placeholder; ``replay`` only looks at what is on disk. With a
+    :class:`~kanoha_import.retry.RetryScheduler`, transient failures are
+    retried, and those of a ``product`` are queued for :meth:`retry_deferred`.
+    Extra keyword arguments go to :func:`fetch_image`.
+    """
+
+    def __init__(self, session, image_dir, manifest, retry=None, replay=False, max_age=None,
+                 **kwargs):
+        self.session = session
+        self.image_dir = image_dir
+        self.manifest = manifest
+        self.retry = retry
+        self.replay = replay
+        self.max_age = max_age
+        self.kwargs = kwargs
+
+    def __call__(self, url, filename, product=None):
+        if not url:
+            return PLACEHOLDER
+        local_path = os.path.join(self.image_dir, filename)
+        if self.replay:
+            return IMAGE_URL + filename if _on_disk(local_path) else PLACEHOLDER
+
+        def fetch():
+            # Conditional GET: an unchanged image comes back as 304 and is left alone
+            return fetch_image(self.session, url, local_path, self.manifest,
+                               max_age=self.max_age, **self.kwargs)
+
+        try:
+            if self.retry is None:
+                if fetch():
+                    return IMAGE_URL + filename
+            elif self.retry.call(url, fetch):
+                return IMAGE_URL + filename
+        except Exception as e:
+            if self.retry is not None and product is not None and isinstance(e, TRANSIENT_ERRORS):
+                self.retry.defer((product, url, filename))
+            else:
+                print(f"Error downloading {url}: {e}")
+            # Keep serving the copy from a previous run
+            if _on_disk(local_path):
+                return IMAGE_URL + filename
+        return PLACEHOLDER
+
+    def retry_deferred(self):
+        """Try the deferred images once more, once the open circuits have cooled down."""
+        deferred = self.retry.take_deferred() if self.retry is not None else []
+        if not deferred:
+            return
+        print(f"Retrying {len(deferred)} images after the main pass...")
+        time.sleep(self.retry.breaker.wait_time())
+        for product, url, filename in deferred:
+            product["img"] = self(url, filename)
+            self.retry.recovered += product["img"] != PLACEHOLDER
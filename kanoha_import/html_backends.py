@@ -0,0 +1,154 @@
+"""Pluggable HTML parsing backends for the WooCommerce shop pages.
+
+Every backend turns a shop page into the same raw item records::
+
+    {"title": ..., "h2": ..., "price": ..., "img": {attr: value} or None,
+     "classes": [...]}
+
+``title`` is the ``.woocommerce-loop-product__title`` text, ``h2`` the first
+``<h2>``, ``price`` the ``.price`` text (each stripped, or None when absent)
+and ``img`` the attributes of the first ``<img>``. The scrapers decide what to
+make of them. selectolax is fastest, lxml next; BeautifulSoup is the fallback
+when neither is installed.
+"""
+import importlib.util
+
+ITEM_SELECTORS = ('.product', 'li.product', '.type-product')
+TITLE_SELECTOR = '.woocommerce-loop-product__title'
+PRICE_SELECTOR = '.price'
+IMG_ATTRS = ('src', 'data-src', 'srcset')
+
+
+def _record(title, h2, price, img, classes):
+    return {'title': title, 'h2': h2, 'price': price, 'img': img, 'classes': classes}
+
+
+class SelectolaxBackend:
+    name = 'selectolax'
+
+    def __init__(self):
+        from selectolax.parser import HTMLParser
+        self._parser = HTMLParser
+
+    @staticmethod
+    def _text(node, selector):
+        found = node.css_first(selector)
+        return found.text(deep=True).strip() if found is not None else None
+
+    def extract(self, html, item_selectors=ITEM_SELECTORS):
+        tree = self._parser(html)
+        items = []
+        for selector in item_selectors:
+            items = tree.css(selector)
+            if items:
+                break
+        records = []
+        for item in items:
+            img = item.css_first('img')
+            records.append(_record(
+                self._text(item, TITLE_SELECTOR),
+                self._text(item, 'h2'),
+                self._text(item, PRICE_SELECTOR),
+                {a: img.attributes[a] for a in IMG_ATTRS if img.attributes.get(a)} if img is not None else None,
+                (item.attributes.get('class') or '').split(),
+            ))
+        return records
+
+
+class LxmlBackend:
+    name = 'lxml'
+
+    def __init__(self):
+        import lxml.html
+        from lxml.cssselect import CSSSelector
+        self._fromstring = lxml.html.fromstring
+        # Compiled to XPath once, reused for every page
+        self._item_selectors = {s: CSSSelector(s) for s in ITEM_SELECTORS}
+        self._compile = CSSSelector
+        self._title = CSSSelector(TITLE_SELECTOR)
+        self._h2 = CSSSelector('h2')
+        self._price = CSSSelector(PRICE_SELECTOR)
+        self._img = CSSSelector('img')
+
+    @staticmethod
+    def _text(item, selector):
+        found = selector(item)
+        return found[0].text_content().strip() if found else None
+
+    def extract(self, html, item_selectors=ITEM_SELECTORS):
+        if not html.strip():
+            return []
+        tree = self._fromstring(html)
+        items = []
+        for selector in item_selectors:
+            compiled = self._item_selectors.get(selector)
+            if compiled is None:
+                compiled = self._item_selectors[selector] = self._compile(selector)
+            items = compiled(tree)
+            if items:
+                break
+        records = []
+        for item in items:
+            imgs = self._img(item)
+            records.append(_record(
+                self._text(item, self._title),
+                self._text(item, self._h2),
+                self._text(item, self._price),
+                {a: imgs[0].get(a) for a in IMG_ATTRS if imgs[0].get(a)} if imgs else None,
+                (item.get('class') or '').split(),
+            ))
+        return records
+
+
+class SoupBackend:
+    name = 'bs4'
+
+    def __init__(self):
+        from bs4 import BeautifulSoup
+        self._soup = BeautifulSoup
+
+    @staticmethod
+    def _text(item, selector):
+        found = item.select_one(selector)
+        return found.text.strip() if found is not None else None
+
+    def extract(self, html, item_selectors=ITEM_SELECTORS):
+        soup = self._soup(html, 'html.parser')
+        items = []
+        for selector in item_selectors:
+            items = soup.select(selector)
+            if items:
+                break
+        records = []
+        for item in items:
+            img = item.select_one('img')
+            records.append(_record(
+                self._text(item, TITLE_SELECTOR),
+                self._text(item, 'h2'),
+                self._text(item, PRICE_SELECTOR),
+                {a: img.get(a) for a in IMG_ATTRS if img.get(a)} if img is not None else None,
+                list(item.get('class', [])),
+            ))
+        return records
+
+
+# Fastest first: name -> (modules it needs, class)
+BACKENDS = {
+    'selectolax': (('selectolax',), SelectolaxBackend),
+    'lxml': (('lxml', 'cssselect'), LxmlBackend),
+    'bs4': (('bs4',), SoupBackend),
+}
+
+
+def available_backends():
+    return [name for name, (modules, _) in BACKENDS.items()
+            if all(importlib.util.find_spec(m) is not None for m in modules)]
+
+
+def get_backend(name=None):
+    """Instantiate backend ``name``, or the fastest one that is installed."""
+    if name is not None:
+        return BACKENDS[name][1]()
+    for candidate in available_backends():
+        return BACKENDS[candidate][1]()
+    raise RuntimeError("no HTML parser available: install selectolax, lxml + cssselect or bs4")
@@ -0,0 +1,194 @@
+"""Persistent HTTP response cache with TTL, revalidation and offline replay.
+
+Each response is kept as two files under the cache directory, named after
+the SHA-256 of its URL: ``<key>.json`` with the URL, status, headers and the
+time it was stored or last revalidated, and ``<key>.body`` with the raw body.
+Entries are plain files, so a cache directory can be checked in and replayed
+as test fixtures.
+
+Modes:
+
+``default``
+    serve entries younger than ``ttl``; revalidate older ones with their
+    ETag/Last-Modified and fetch whatever is not cached.
+``refresh``
+    revalidate every entry, whatever its age.
+``replay``
+    never touch the network; a URL that is not cached raises
+    :class:`CacheMiss`.
+"""
+import hashlib
+import json
+import os
+import time
+
+from kanoha_import.paths import atomic_open, atomic_write_json
+
+MODES = ('default', 'refresh', 'replay')
+DEFAULT_TTL = 24 * 3600
+
+
+class CacheMiss(Exception):
+    """A URL was requested in replay mode but is not in the cache."""
+
+
+class Headers(dict):
+    """Response headers with case-insensitive ``get`` and lookup."""
+
+    def __init__(self, headers=()):
+        super().__init__((k.lower(), v) for k, v in dict(headers).items())
+
+    def __getitem__(self, key):
+        return super().__getitem__(key.lower())
+
+    def __contains__(self, key):
+        return super().__contains__(key.lower())
+
+    def get(self, key, default=None):
+        return super().get(key.lower(), default)
+
+
+class CachedResponse:
+    """Enough of ``requests.Response`` for the scripts, served from the cache."""
+
+    from_cache = True
+
+    def __init__(self, url, status_code, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.headers = Headers(headers)
+        self.content = content
+
+    @property
+    def encoding(self):
+        content_type = self.headers.get('Content-Type', '')
+        for param in content_type.split(';')[1:]:
+            name, _, value = param.strip().partition('=')
+            if name.lower() == 'charset' and value:
+                return value.strip('"\'')
+        return 'utf-8'
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors='replace')
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class ResponseCache:
+    """Responses on disk, keyed by URL; see the module docstring for ``mode``."""
+
+    def __init__(self, directory, ttl=DEFAULT_TTL, mode='default'):
+        if mode not in MODES:
+            raise ValueError(f"unknown cache mode {mode!r}, expected one of {MODES}")
+        self.directory = directory
+        self.ttl = ttl
+        self.mode = mode
+        self.hits = self.revalidated = self.fetched = 0
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.directory, key[:2], key)
+        return f"{base}.json", f"{base}.body"
+
+    def load(self, url):
+        """The stored entry for ``url`` (metadata plus ``body``), or None."""
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, 'r') as f:
+                entry = json.load(f)
+            with open(body_path, 'rb') as f:
+                entry['body'] = f.read()
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def is_fresh(self, entry):
+        """True if ``entry`` may be served without asking the origin."""
+        if self.mode == 'replay':
+            return True
+        if self.mode == 'refresh':
+            return False
+        return time.time() - entry['stored_at'] < self.ttl
+
+    @staticmethod
+    def validators(entry):
+        """Conditional request headers that revalidate ``entry``."""
+        headers = {}
+        if entry['headers'].get('etag'):
+            headers['If-None-Match'] = entry['headers']['etag']
+        if entry['headers'].get('last-modified'):
+            headers['If-Modified-Since'] = entry['headers']['last-modified']
+        return headers
+
+    def store(self, url, status, headers, body):
+        """Save a response; returns the new entry."""
+        meta_path, body_path = self._paths(url)
+        entry = {'url': url, 'status': status, 'headers': dict(Headers(headers)),
+                 'stored_at': time.time()}
+        # Body first, so a metadata file always has a complete body beside it
+        with atomic_open(body_path, 'wb') as f:
+            f.write(body)
+        atomic_write_json(meta_path, entry, indent=2, sort_keys=True)
+        entry['body'] = body
+        return entry
+
+    def touch(self, url, entry, headers):
+        """Mark ``entry`` fresh again after the origin answered 304."""
+        headers = Headers(headers)
+        for name in ('etag', 'last-modified'):
+            if headers.get(name):
+                entry['headers'][name] = headers[name]
+        entry['stored_at'] = time.time()
+        meta = {k: v for k, v in entry.items() if k != 'body'}
+        atomic_write_json(self._paths(url)[0], meta, indent=2, sort_keys=True)
+        return entry
+
+    def response(self, entry):
+        return CachedResponse(entry['url'], entry['status'], entry['headers'], entry['body'])
+
+
+class CachedSession:
+    """Wrap a ``requests.Session`` (or the ``requests`` module) with a cache.
+
+    Only successful (200) responses are stored. Responses from the network
+    are read in full before they are returned.
+    """
+
+    def __init__(self, session, cache):
+        self.session = session
+        self.cache = cache
+
+    def get(self, url, headers=None, **kwargs):
+        cache = self.cache
+        entry = cache.load(url)
+        if entry is not None and cache.is_fresh(entry):
+            cache.hits += 1
+            return cache.response(entry)
+        if cache.mode == 'replay':
+            raise CacheMiss(f"{url} is not in the cache (replay mode)")
+
+        request_headers = dict(headers or {})
+        if entry is not None:
+            request_headers.update(cache.validators(entry))
+        kwargs.pop('stream', None)
+        response = self.session.get(url, headers=request_headers, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            cache.revalidated += 1
+            return cache.response(cache.touch(url, entry, response.headers))
+        cache.fetched += 1
+        if response.status_code != 200:
+            return response
+        return cache.response(cache.store(url, response.status_code, response.headers,
+                                          response.content))
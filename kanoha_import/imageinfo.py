@@ -0,0 +1,92 @@
+"""Read image format and dimensions from file headers, without decoding pixels."""
+import os
+import struct
+
+
+class ImageError(Exception):
+    """The file is empty, truncated or not an image we can read."""
+
+
+def _jpeg_size(f):
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        while byte and byte != b'\xff':
+            byte = f.read(1)
+        while byte == b'\xff':
+            byte = f.read(1)
+        if not byte:
+            raise ImageError("truncated JPEG header")
+        marker = byte[0]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            continue
+        if marker in (0xD9, 0xDA):
+            raise ImageError("JPEG has no frame header")
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            raise ImageError("truncated JPEG header")
+        length = struct.unpack('>H', length_bytes)[0]
+        # SOF0-SOF15, except DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            data = f.read(5)
+            if len(data) < 5:
+                raise ImageError("truncated JPEG frame header")
+            height, width = struct.unpack('>HH', data[1:5])
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def _webp_size(head):
+    chunk = head[12:16]
+    if chunk == b'VP8 ' and len(head) >= 30:
+        width, height = struct.unpack('<HH', head[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b'VP8L' and len(head) >= 25:
+        bits = struct.unpack('<I', head[21:25])[0]
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b'VP8X' and len(head) >= 30:
+        return (int.from_bytes(head[24:27], 'little') + 1,
+                int.from_bytes(head[27:30], 'little') + 1)
+    raise ImageError("unknown WebP chunk")
+
+
+def probe(path):
+    """Return ``(format, width, height, size)`` for an image file.
+
+    Besides parsing the header this checks the end of the file (JPEG EOI,
+    PNG IEND, GIF trailer, RIFF length), which catches most truncated
+    downloads. Raises :class:`ImageError` when the file fails any check.
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            raise ImageError("empty file")
+        head = f.read(32)
+
+        if head.startswith(b'\xff\xd8'):
+            fmt = 'jpeg'
+            width, height = _jpeg_size(f)
+            f.seek(max(0, size - 1024))
+            intact = b'\xff\xd9' in f.read()
+        elif head.startswith(b'\x89PNG\r\n\x1a\n') and head[12:16] == b'IHDR':
+            fmt = 'png'
+            width, height = struct.unpack('>II', head[16:24])
+            f.seek(max(0, size - 12))
+            intact = f.read(12) == b'\x00\x00\x00\x00IEND\xaeB`\x82'
+        elif head[:6] in (b'GIF87a', b'GIF89a'):
+            fmt = 'gif'
+            width, height = struct.unpack('<HH', head[6:10])
+            f.seek(size - 1)
+            intact = f.read(1) == b';'
+        elif head.startswith(b'RIFF') and head[8:12] == b'WEBP':
+            fmt = 'webp'
+            width, height = _webp_size(head)
+            intact = struct.unpack('<I', head[4:8])[0] + 8 <= size
+        else:
+            raise ImageError("not a recognised image format")
+
+    if not intact:
+        raise ImageError(f"truncated {fmt} file")
+    if width == 0 or height == 0:
+        raise ImageError(f"{fmt} has zero dimensions")
+    return fmt, width, height, size
@@ -0,0 +1,126 @@
+"""Dimensions, size, dominant color and a blurred placeholder for each product image.
+
+:func:`annotate_products` adds to every product with a local image::
+
+    "width": 1000, "height": 750, "bytes": 48213, "color": "#e8e4df",
+    "lqip": "data:image/webp;base64,UklGR..."
+
+so the grid can reserve the right box before the image arrives and paint
+its dominant color, or the few-pixel ``lqip`` stretched and blurred, in the
+meantime. ``lqip`` is a WebP at most ``LQIP_SIZE`` pixels on its long side,
+around 120 characters of base64.
+
+``state_file`` keeps the results by SHA-256, so a renamed or re-downloaded
+copy of an image is not decoded again, and each file's hash, which is
+trusted for as long as the file's size and mtime stay the same.
+"""
+import base64
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from kanoha_import.manifest import file_sha256
+from kanoha_import.paths import IMAGE_URL, atomic_write_json, load_json
+
+FIELDS = ('width', 'height', 'bytes', 'color', 'lqip')
+LQIP_SIZE = 12
+LQIP_QUALITY = 40
+# Colors the image is reduced to before picking the most common one
+PALETTE_SIZE = 8
+
+
+def image_meta(path):
+    """The metadata fields for one image; runs in a worker process."""
+    with Image.open(path) as im:
+        width, height = im.size
+        # Only a thumbnail is needed from here on; let JPEG decode at a reduced scale
+        im.draft('RGB', (64, 64))
+        if im.mode in ('RGBA', 'LA', 'PA') or 'transparency' in im.info:
+            # The grid shows images on white
+            rgba = im.convert('RGBA')
+            small = Image.new('RGB', rgba.size, 'white')
+            small.paste(rgba, mask=rgba.getchannel('A'))
+        else:
+            small = im.convert('RGB')
+    small.thumbnail((64, 64))
+    palette = small.quantize(PALETTE_SIZE)
+    _, index = max(palette.getcolors())
+    r, g, b = palette.getpalette()[index * 3:index * 3 + 3]
+
+    small.thumbnail((LQIP_SIZE, LQIP_SIZE))
+    buffer = io.BytesIO()
+    small.save(buffer, 'WEBP', quality=LQIP_QUALITY)
+    lqip = "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode('ascii')
+    return {'width': width, 'height': height, 'bytes': os.path.getsize(path),
+            'color': f"#{r:02x}{g:02x}{b:02x}", 'lqip': lqip}
+
+
+def annotate_products(products, image_dir, state_file, workers=None, url_prefix=IMAGE_URL):
+    """Set :data:`FIELDS` on each product with a local image, and drop them from the others.
+
+    New or changed images are measured on a process pool. Returns the number
+    of images measured this run.
+    """
+    state = load_json(state_file, {'files': {}, 'images': {}})
+
+    files = {}
+    jobs = {}
+    for product in products:
+        img = product.get('img') or ''
+        if not img.startswith(url_prefix):
+            continue
+        source = os.path.join(image_dir, img[len(url_prefix):])
+        if source in files:
+            continue
+        try:
+            st = os.stat(source)
+        except OSError:
+            continue
+        entry = state['files'].get(source)
+        if entry and (entry['size'], entry['mtime_ns']) == (st.st_size, st.st_mtime_ns):
+            digest = entry['sha256']
+        else:
+            digest = file_sha256(source)
+        files[source] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': digest}
+        if digest not in state['images']:
+            jobs.setdefault(digest, source)
+
+    images = {}
+    failed = 0
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {digest: executor.submit(image_meta, source)
+                       for digest, source in jobs.items()}
+            for digest, future in futures.items():
+                try:
+                    images[digest] = future.result()
+                except Exception as e:
+                    print(f"Error reading {jobs[digest]}: {e}")
+                    failed += 1
+
+    # Keep only what this run's images refer to
+    new_state = {'files': {}, 'images': {}}
+    for source, entry in files.items():
+        meta = images.get(entry['sha256']) or state['images'].get(entry['sha256'])
+        if meta is not None:
+            new_state['files'][source] = entry
+            new_state['images'][entry['sha256']] = meta
+
+    for product in products:
+        img = product.get('img') or ''
+        entry = None
+        if img.startswith(url_prefix):
+            entry = new_state['files'].get(os.path.join(image_dir, img[len(url_prefix):]))
+        for field in FIELDS:
+            product.pop(field, None)
+        if entry is not None:
+            product.update(new_state['images'][entry['sha256']])
+
+    atomic_write_json(state_file, new_state)
+
+    measured = len(jobs) - failed
+    reused = sum(1 for entry in files.values() if entry['sha256'] in state['images'])
+    print(f"Measured {measured} images, {reused} unchanged, {failed} failed.")
+    return measured
@@ -0,0 +1,49 @@
+"""State for incremental WXR re-imports."""
+import hashlib
+
+from kanoha_import.paths import atomic_write_json, load_json
+
+
+def item_digest(*fields):
+    """Stable hash of the item fields a product is built from."""
+    digest = hashlib.sha1()
+    for field in fields:
+        digest.update((field or '').encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class ImportState:
+    """``wp:post_id`` -> (``wp:post_modified_gmt``, content hash) of the last import.
+
+    Items are marked as they are seen during a run; anything recorded last
+    time but not seen this time has been deleted from the export. ``merged``
+    maps the items a ``--dedupe merge`` left out of the catalog to the one
+    they were merged into.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        state = load_json(path, {})
+        self.previous = state.get('items', {})
+        self.current = {}
+        self.previous_merged = state.get('merged', {})
+        self.merged = {}
+
+    def is_unchanged(self, post_id, modified, digest):
+        entry = self.previous.get(post_id)
+        return entry is not None and entry['modified'] == modified and entry['hash'] == digest
+
+    def mark(self, post_id, modified, digest):
+        self.current[post_id] = {'modified': modified, 'hash': digest}
+
+    def kept(self, post_id):
+        """True if ``post_id`` was seen this run, unchanged since the last one."""
+        entry = self.current.get(post_id)
+        return entry is not None and self.previous.get(post_id) == entry
+
+    def deleted(self):
+        return [post_id for post_id in self.previous if post_id not in self.current]
+
+    def save(self):
+        atomic_write_json(self.path, {'items': self.current, 'merged': self.merged})
@@ -0,0 +1,89 @@
+"""On-disk manifest of downloaded files, used for conditional re-fetching."""
+import hashlib
+import os
+import time
+from email.utils import formatdate
+
+from kanoha_import.paths import atomic_write_json, load_json
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DownloadManifest:
+    """Validators and content hashes of downloaded files, keyed by source URL.
+
+    Each entry records the local path, ETag, Last-Modified, content length,
+    SHA-256 of the body and when the origin was last asked, so a re-run can ask the origin whether anything
+    changed instead of fetching the file again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = load_json(path, {})
+        self.dirty = False
+
+    def get(self, url):
+        return self.entries.get(url)
+
+    def is_current(self, url, local_path):
+        """True if ``local_path`` is the intact file last fetched from ``url``."""
+        entry = self.entries.get(url)
+        if not entry or entry.get('path') != local_path:
+            return False
+        try:
+            return os.path.getsize(local_path) == entry.get('length')
+        except OSError:
+            return False
+
+    def is_fresh(self, url, local_path, max_age):
+        """True if ``local_path`` is current and was checked within ``max_age`` seconds."""
+        if max_age is None or not self.is_current(url, local_path):
+            return False
+        return time.time() - self.entries[url].get('checked', 0) < max_age
+
+    def conditional_headers(self, url, local_path):
+        """Request headers that let the origin answer 304 for an unchanged file."""
+        if self.is_current(url, local_path):
+            entry = self.entries[url]
+            headers = {}
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+            return headers
+        # A file from before the manifest existed: trust its mtime
+        if url not in self.entries and os.path.exists(local_path) and os.path.getsize(local_path) > 0:
+            return {'If-Modified-Since': formatdate(os.path.getmtime(local_path), usegmt=True)}
+        return {}
+
+    def record(self, url, local_path, response_headers, length=None, sha256=None):
+        """Store the validators for ``url``; hash the file if no digest is given."""
+        previous = self.entries.get(url) or {}
+        if length is None:
+            length = os.path.getsize(local_path)
+        if sha256 is None:
+            if previous.get('path') == local_path and previous.get('length') == length:
+                sha256 = previous.get('sha256')
+            else:
+                sha256 = file_sha256(local_path)
+        self.entries[url] = {
+            'path': local_path,
+            'etag': response_headers.get('ETag') or previous.get('etag'),
+            'last_modified': response_headers.get('Last-Modified') or previous.get('last_modified'),
+            'length': length,
+            'sha256': sha256,
+            'checked': time.time(),
+        }
+        self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        atomic_write_json(self.path, self.entries, indent=2, sort_keys=True)
+        self.dirty = False
@@ -0,0 +1,203 @@
+"""Per-stage timings and counters for an import run.
+
+    metrics = RunMetrics('xml_v3')
+    with metrics.stage('parse'):
+        ...
+    metrics.incr('download_failures', reason='HTTP 404')
+    metrics.write_json(report_file)
+    metrics.write_prometheus(textfile)
+
+Each stage records wall and CPU time and the process's peak RSS when it
+ended; a stage entered more than once accumulates. Stages that run
+concurrently, such as those of a streaming pipeline, are timed by their
+runner and added with :meth:`RunMetrics.add_stage`; their wall time is the
+time their workers were busy, summed. Counters are plain numbers, or
+per-reason breakdowns when incremented with ``reason``.
+
+``profile='cprofile'`` dumps a ``<run>-<stage>.prof`` per stage into
+``profile_dir`` (open with ``python -m pstats`` or snakeviz). cProfile only
+sees the thread that started it, so functions handed to worker threads
+should go through :meth:`RunMetrics.profiled`: each thread then gets a
+profiler of its own, merged into the stage's dump. ``profile='tracemalloc'``
+adds each stage's peak traced memory and its top allocation sites to the
+report.
+"""
+import cProfile
+import os
+import pstats
+import re
+import resource
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from kanoha_import.paths import atomic_open, atomic_write_json
+
+PROFILERS = ('cprofile', 'tracemalloc')
+TOP_ALLOCATIONS = 10
+
+
+def _peak_rss_bytes():
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RunMetrics:
+    def __init__(self, name, profile=None, profile_dir=None):
+        if profile not in (None,) + PROFILERS:
+            raise ValueError(f"unknown profiler {profile!r}, expected one of {PROFILERS}")
+        self.name = name
+        self.profile = profile
+        self.profile_dir = profile_dir
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self.stages = {}
+        self.counters = {}
+        self._profiling = False
+        # While a cProfile stage runs: its thread, and a profiler per worker thread
+        self._profiled_thread = None
+        self._thread_profilers = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as stage ``name``."""
+        # Only the outermost stage is profiled; profilers don't nest
+        profiling = self.profile if not self._profiling else None
+        self._profiling = self._profiling or profiling is not None
+        profiler = None
+        if profiling == 'cprofile':
+            profiler = cProfile.Profile()
+            self._profiled_thread = threading.get_ident()
+            self._thread_profilers = {}
+            profiler.enable()
+        elif profiling == 'tracemalloc':
+            tracemalloc.start()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            entry = self._entry(name)
+            entry['calls'] += 1
+            entry['wall_seconds'] += wall
+            entry['cpu_seconds'] += cpu
+            if profiler is not None:
+                profiler.disable()
+                self._profiled_thread = None
+                stats = pstats.Stats(profiler)
+                for thread_profiler in self._thread_profilers.values():
+                    stats.add(thread_profiler)
+                os.makedirs(self.profile_dir, exist_ok=True)
+                stats.dump_stats(os.path.join(self.profile_dir, f"{self.name}-{name}.prof"))
+            elif profiling == 'tracemalloc':
+                entry['traced_peak_bytes'] = max(entry.get('traced_peak_bytes', 0),
+                                                 tracemalloc.get_traced_memory()[1])
+                entry['top_allocations'] = [
+                    {'where': str(stat.traceback), 'bytes': stat.size, 'count': stat.count}
+                    for stat in tracemalloc.take_snapshot().statistics('lineno')[:TOP_ALLOCATIONS]]
+                tracemalloc.stop()
+            if profiling is not None:
+                self._profiling = False
+
+    def _entry(self, name):
+        entry = self.stages.setdefault(name, {'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0})
+        entry['peak_rss_bytes'] = _peak_rss_bytes()
+        return entry
+
+    def add_stage(self, name, wall_seconds, cpu_seconds, calls=1):
+        """Record stage ``name`` as timed by whatever ran it."""
+        entry = self._entry(name)
+        entry['calls'] += calls
+        entry['wall_seconds'] += wall_seconds
+        entry['cpu_seconds'] += cpu_seconds
+
+    def profiled(self, fn):
+        """``fn``, profiled into the current cProfile stage when called on another thread."""
+        if self.profile != 'cprofile':
+            return fn
+
+        def call(*args, **kwargs):
+            profiler = self._thread_profiler()
+            if profiler is None:
+                return fn(*args, **kwargs)
+            profiler.enable()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profiler.disable()
+        return call
+
+    def _thread_profiler(self):
+        thread = threading.get_ident()
+        if self._profiled_thread in (None, thread):
+            return None
+        with self._lock:
+            profiler = self._thread_profilers.get(thread)
+            if profiler is None:
+                profiler = cProfile.Profile()
+                try:
+                    profiler.enable()
+                    profiler.disable()
+                except ValueError:
+                    # Python 3.12+ profiles every thread from one profiler and
+                    # refuses a second: the stage's own already sees them all
+                    self._profiled_thread = None
+                    return None
+                self._thread_profilers[thread] = profiler
+        return profiler
+
+    def incr(self, name, amount=1, reason=None):
+        """Add ``amount`` to counter ``name``, broken down by ``reason`` if given."""
+        if reason is None:
+            self.counters[name] = self.counters.get(name, 0) + amount
+        else:
+            by_reason = self.counters.setdefault(name, {})
+            by_reason[reason] = by_reason.get(reason, 0) + amount
+
+    def report(self):
+        return {
+            'run': self.name,
+            'started': self.started,
+            'wall_seconds': round(time.perf_counter() - self._start, 6),
+            'cpu_seconds': round(time.process_time() - self._cpu_start, 6),
+            'peak_rss_bytes': _peak_rss_bytes(),
+            'stages': {name: {k: round(v, 6) if isinstance(v, float) else v
+                              for k, v in entry.items()}
+                       for name, entry in self.stages.items()},
+            'counters': self.counters,
+        }
+
+    def write_json(self, path):
+        atomic_write_json(path, self.report(), indent=2)
+
+    def write_prometheus(self, path):
+        """Write the run in the node_exporter textfile collector format."""
+        report = self.report()
+        run = f'run="{self.name}"'
+        lines = [
+            '# TYPE kanoha_import_last_run_timestamp_seconds gauge',
+            f'kanoha_import_last_run_timestamp_seconds{{{run}}} {report["started"]:.0f}',
+            '# TYPE kanoha_import_run_seconds gauge',
+            f'kanoha_import_run_seconds{{{run}}} {report["wall_seconds"]}',
+            '# TYPE kanoha_import_peak_rss_bytes gauge',
+            f'kanoha_import_peak_rss_bytes{{{run}}} {report["peak_rss_bytes"]}',
+        ]
+        for metric, key in (('stage_seconds', 'wall_seconds'), ('stage_cpu_seconds', 'cpu_seconds'),
+                            ('stage_peak_rss_bytes', 'peak_rss_bytes')):
+            lines.append(f'# TYPE kanoha_import_{metric} gauge')
+            for stage, entry in report['stages'].items():
+                lines.append(f'kanoha_import_{metric}{{{run},stage="{stage}"}} {entry[key]}')
+        for name, value in report['counters'].items():
+            metric = 'kanoha_import_' + re.sub(r'[^a-zA-Z0-9_]', '_', name)
+            lines.append(f'# TYPE {metric} gauge')
+            if isinstance(value, dict):
+                for reason, count in sorted(value.items()):
+                    reason = reason.replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+                    lines.append(f'{metric}{{{run},reason="{reason}"}} {count}')
+            else:
+                lines.append(f'{metric}{{{run}}} {value}')
+        with atomic_open(path) as f:
+            f.write('\n'.join(lines) + '\n')
@@ -0,0 +1,135 @@
+"""Responsive WebP/AVIF variants for downloaded product images."""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from kanoha_import.manifest import file_sha256
+from kanoha_import.paths import atomic_write_json, load_json
+
+WIDTHS = (320, 640, 1024)
+WEBP_QUALITY = 80
+AVIF_QUALITY = 60
+
+
+def _variant_path(out_dir, stem, width, ext):
+    return os.path.join(out_dir, f"{stem}-{width}.{ext}")
+
+
+def optimize_image(job):
+    """Write resized variants of one source image; runs in a worker process.
+
+    ``job`` is ``(source_path, out_dir, widths, avif)``. Returns a list of
+    ``(width, {format: path})`` for the widths produced. Widths larger than
+    the source are replaced by a single variant at the source's own width.
+    """
+    source_path, out_dir, widths, avif = job
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    variants = []
+    with Image.open(source_path) as im:
+        im.load()
+        if im.mode not in ('RGB', 'RGBA'):
+            im = im.convert('RGBA' if 'transparency' in im.info or im.mode in ('LA', 'PA') else 'RGB')
+        targets = [w for w in widths if w < im.width]
+        if im.width <= max(widths):
+            targets.append(im.width)
+        for width in targets:
+            height = max(1, round(im.height * width / im.width))
+            resized = im.resize((width, height), Image.LANCZOS) if width != im.width else im
+            paths = {'webp': _variant_path(out_dir, stem, width, 'webp')}
+            resized.save(paths['webp'], 'WEBP', quality=WEBP_QUALITY, method=4)
+            if avif:
+                avif_path = _variant_path(out_dir, stem, width, 'avif')
+                try:
+                    resized.save(avif_path, 'AVIF', quality=AVIF_QUALITY)
+                    paths['avif'] = avif_path
+                except (KeyError, OSError):
+                    # This Pillow build has no AVIF encoder
+                    pass
+            variants.append((width, paths))
+    return variants
+
+
+def _srcset(variants, fmt, image_dir, url_prefix):
+    entries = []
+    for width, paths in variants:
+        if fmt in paths:
+            rel = os.path.relpath(paths[fmt], image_dir).replace(os.sep, '/')
+            entries.append(f"{url_prefix}{rel} {width}w")
+    return ", ".join(entries)
+
+
+def optimize_products(products, image_dir, out_dir, state_file, widths=WIDTHS,
+                      avif=False, workers=None, url_prefix="/images/products/"):
+    """Add ``srcset`` (and ``srcsetAvif``) to each product with a local image.
+
+    Variants are generated on a process pool. A source whose SHA-256 matches
+    the last run keeps its existing variants; size and mtime are compared
+    first so unchanged files are not even re-read.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    state = load_json(state_file, {})
+    options = [list(widths), avif]
+
+    new_state = {}
+    jobs = {}
+    for product in products:
+        img = product.get('img') or ''
+        if not img.startswith(url_prefix):
+            continue
+        source = os.path.join(image_dir, img[len(url_prefix):])
+        if source in new_state or source in jobs:
+            continue
+        try:
+            st = os.stat(source)
+        except OSError:
+            continue
+        entry = state.get(source)
+        if entry and entry['options'] == options and all(
+                os.path.exists(p) for _, paths in entry['variants'] for p in paths.values()):
+            if (entry['size'], entry['mtime_ns']) == (st.st_size, st.st_mtime_ns):
+                new_state[source] = entry
+                continue
+            digest = file_sha256(source)
+            if digest == entry['sha256']:
+                new_state[source] = dict(entry, size=st.st_size, mtime_ns=st.st_mtime_ns)
+                continue
+        else:
+            digest = file_sha256(source)
+        jobs[source] = {'sha256': digest, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+                        'options': options}
+
+    reused = len(new_state)
+    failed = 0
+    if jobs:
+        sources = list(jobs)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(optimize_image, (s, out_dir, tuple(widths), avif))
+                       for s in sources]
+            for source, future in zip(sources, futures):
+                try:
+                    variants = future.result()
+                except Exception as e:
+                    print(f"Error optimizing {source}: {e}")
+                    failed += 1
+                    continue
+                new_state[source] = dict(jobs[source], variants=variants)
+
+    for product in products:
+        img = product.get('img') or ''
+        entry = None
+        if img.startswith(url_prefix):
+            entry = new_state.get(os.path.join(image_dir, img[len(url_prefix):]))
+        if entry is None:
+            product.pop('srcset', None)
+            product.pop('srcsetAvif', None)
+            continue
+        product['srcset'] = _srcset(entry['variants'], 'webp', image_dir, url_prefix)
+        if avif and any('avif' in paths for _, paths in entry['variants']):
+            product['srcsetAvif'] = _srcset(entry['variants'], 'avif', image_dir, url_prefix)
+        else:
+            product.pop('srcsetAvif', None)
+
+    atomic_write_json(state_file, new_state)
+
+    print(f"Optimized {len(jobs) - failed} images, {reused} unchanged, {failed} failed.")
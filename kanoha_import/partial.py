@@ -0,0 +1,123 @@
+"""Atomic, resumable writes of a download into its final path.
+
+Bytes go to ``<path>.part`` and only replace ``<path>`` once the body has
+been received in full (checked against Content-Length or Content-Range), so
+an interrupted transfer never leaves a truncated file where a complete one
+is expected. The ``ETag``/``Last-Modified`` of the response that started the
+``.part`` file are kept in ``<path>.part.json``; the next attempt asks for
+the rest with ``Range`` + ``If-Range``, and the origin either sends the
+missing bytes (206) or, if the file changed meanwhile, all of it (200).
+
+Used by both the blocking and the asyncio fetchers; they own the HTTP and
+hand every response and chunk to a :class:`PartialDownload`.
+"""
+import hashlib
+import json
+import os
+import re
+
+CONTENT_RANGE = re.compile(r'bytes (\d+)-(\d+)/(\d+|\*)')
+
+
+class IncompleteDownload(Exception):
+    """The body did not match what the response headers promised."""
+
+
+def _identity(headers):
+    # Lengths only describe the bytes we store when the body is not re-encoded
+    return headers.get('Content-Encoding', 'identity').lower() == 'identity'
+
+
+class PartialDownload:
+    """One attempt at downloading ``url`` into ``path``."""
+
+    def __init__(self, url, path, buffering=-1):
+        self.url = url
+        self.path = path
+        self.buffering = buffering
+        self.part_path = f"{path}.part"
+        self.meta_path = f"{path}.part.json"
+        self.offset = 0
+        self.expected = None
+        self.length = 0
+        self.digest = None
+        self._file = None
+        self._resumable = False
+
+    def resume_headers(self):
+        """``Range``/``If-Range`` headers to continue an earlier attempt, or {}."""
+        try:
+            with open(self.meta_path, 'r') as f:
+                meta = json.load(f)
+            size = os.path.getsize(self.part_path)
+        except (OSError, ValueError):
+            self.discard()
+            return {}
+        validator = meta.get('etag') or meta.get('last_modified')
+        if meta.get('url') != self.url or not validator or size == 0:
+            self.discard()
+            return {}
+        self.offset = size
+        return {'Range': f"bytes={size}-", 'If-Range': validator}
+
+    def begin(self, status, headers):
+        """Open the ``.part`` file for a 200 or 206 response."""
+        self.digest = hashlib.sha256()
+        if status == 206:
+            if not self.offset:
+                raise IncompleteDownload("partial content for a request without Range")
+            match = CONTENT_RANGE.match(headers.get('Content-Range', ''))
+            if not match or int(match.group(1)) != self.offset:
+                raise IncompleteDownload(
+                    f"unexpected Content-Range {headers.get('Content-Range')!r} "
+                    f"resuming at byte {self.offset}")
+            if match.group(3) != '*':
+                self.expected = int(match.group(3))
+            with open(self.part_path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    self.digest.update(block)
+            self.length = self.offset
+            self._file = open(self.part_path, 'ab', buffering=self.buffering)
+            self._resumable = True
+            return
+        # A full body, either fresh or because the file changed since the .part
+        self.offset = 0
+        if _identity(headers) and headers.get('Content-Length'):
+            self.expected = int(headers['Content-Length'])
+        self._file = open(self.part_path, 'wb', buffering=self.buffering)
+        etag, last_modified = headers.get('ETag'), headers.get('Last-Modified')
+        self._resumable = _identity(headers) and bool(etag or last_modified)
+        if self._resumable:
+            with open(self.meta_path, 'w') as f:
+                json.dump({'url': self.url, 'etag': etag, 'last_modified': last_modified}, f)
+        elif os.path.exists(self.meta_path):
+            os.remove(self.meta_path)
+
+    def write(self, chunk):
+        self._file.write(chunk)
+        self.digest.update(chunk)
+        self.length += len(chunk)
+
+    def finish(self):
+        """Verify the length and move the file into place; returns ``(length, sha256)``."""
+        self._file.close()
+        if self.expected is not None and self.length != self.expected:
+            self.abort()
+            raise IncompleteDownload(f"received {self.length} of {self.expected} bytes")
+        os.replace(self.part_path, self.path)
+        if os.path.exists(self.meta_path):
+            os.remove(self.meta_path)
+        return self.length, self.digest.hexdigest()
+
+    def abort(self):
+        """Give up on this attempt, keeping the ``.part`` file if it can be resumed."""
+        if self._file is not None:
+            self._file.close()
+        if not self._resumable or (self.expected is not None and self.length > self.expected):
+            self.discard()
+
+    def discard(self):
+        for path in (self.part_path, self.meta_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.offset = 0
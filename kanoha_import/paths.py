@@ -0,0 +1,100 @@
+"""Where the import commands read the export and write the site's files.
+
+Every path hangs off the site checkout, so a scratch copy of the site (a
+benchmark, a worker with its own checkout) is just another ``root``::
+
+    paths = Paths('/tmp/site', xml_file='/tmp/export.xml')
+    paths.ensure()          # create the output directories; nothing else does
+
+Products point at their image with a site URL under ``IMAGE_URL``, served
+from ``image_dir``.
+"""
+import contextlib
+import json
+import os
+import re
+
+SITE_ROOT = "/home/ubuntu/kanoha-import"
+XML_FILE = "/home/ubuntu/upload/pasted_file_GyHyAY_kanohagoods.WordPress.2026-01-06.xml"
+IMAGE_URL = "/images/products/"
+PLACEHOLDER = "/images/products/placeholder.webp"
+
+
+def load_json(path, default=None):
+    """The JSON document in ``path``, or ``default`` if it does not exist yet."""
+    if not os.path.exists(path):
+        return default
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+@contextlib.contextmanager
+def atomic_open(path, mode='w', **kwargs):
+    """Open a temporary file that replaces ``path`` once the block completes.
+
+    Readers see the old file or the new one, never a half-written one, and a
+    crash mid-write leaves ``path`` alone. Its directory is created as needed.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, mode, **kwargs) as f:
+        yield f
+    os.replace(tmp_path, path)
+
+
+def atomic_write_json(path, data, **options):
+    """``json.dump(data)`` into ``path`` through :func:`atomic_open`."""
+    with atomic_open(path) as f:
+        json.dump(data, f, **options)
+
+
+def write_if_changed(path, text):
+    """Write ``text`` to ``path``, atomically, unless it already holds exactly that.
+
+    Returns True if the file was written.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if f.read() == text:
+                return False
+    except OSError:
+        pass
+    with atomic_open(path, encoding='utf-8') as f:
+        f.write(text)
+    return True
+
+
+def clean_filename(name):
+    return re.sub(r'[\\/*?:"<>|]', "", name).replace(" ", "_")
+
+
+class Paths:
+    def __init__(self, root=SITE_ROOT, xml_file=XML_FILE):
+        self.root = root
+        self.xml_file = xml_file
+        cache = os.path.join(root, '.import-cache')
+        data = os.path.join(root, 'client', 'src', 'data')
+        self.cache_dir = cache
+        self.public_dir = os.path.join(root, 'client', 'public')
+        self.image_dir = os.path.join(self.public_dir, 'images', 'products')
+        self.optimized_dir = os.path.join(self.image_dir, 'optimized')
+        self.shard_dir = os.path.join(self.public_dir, 'data', 'catalog')
+        self.data_file = os.path.join(data, 'products.json')
+        self.search_index_file = os.path.join(data, 'search-index.json')
+        self.asset_manifest_file = os.path.join(data, 'asset-manifest.json')
+        self.manifest_file = os.path.join(cache, 'downloads.json')
+        self.state_file = os.path.join(cache, 'wxr-state.json')
+        self.optimize_state_file = os.path.join(cache, 'optimize.json')
+        self.image_meta_state_file = os.path.join(cache, 'image-meta.json')
+        self.search_state_file = os.path.join(cache, 'search-index.json')
+        self.dedupe_state_file = os.path.join(cache, 'dedupe.json')
+        self.catalog_db = os.path.join(cache, 'catalog.sqlite')
+        self.publish_state_file = os.path.join(cache, 'publish.json')
+        self.http_cache_dir = os.path.join(cache, 'http')
+        self.report_file = os.path.join(cache, 'run-report.json')
+        self.clean_report_file = os.path.join(cache, 'clean-report.json')
+        self.profile_dir = os.path.join(cache, 'profiles')
+
+    def ensure(self):
+        os.makedirs(self.image_dir, exist_ok=True)
+        os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
@@ -0,0 +1,210 @@
+"""Staged streaming pipelines over bounded asyncio queues.
+
+    stages = [Stage('categorize', categorize_batch, batch=256),
+              Stage('download', download, workers=32),
+              Stage('validate', validate)]
+    asyncio.run(run_pipeline(records, stages))
+
+``source`` is a blocking iterable (an XML parse, say) and is read on a
+worker thread, so it overlaps with everything downstream. Each stage has its
+own number of workers and a bounded inbox; when a stage falls behind, its
+inbox fills and the stages before it wait instead of piling up items in
+memory. A stage function gets one item (or a list of up to ``batch``
+items) and returns what goes to the next stage: an item, a list of items
+when batched, or None to drop it. Plain functions run on a thread;
+coroutine functions run on the event loop.
+
+Each stage counts its items, the time its workers were busy and the CPU
+time they used: on their thread for plain functions, and for coroutines
+only while they actually run on the loop, not while they wait. Give
+``run_pipeline`` a ``source_stage`` to have reading the source counted the
+same way, and an ``on_thread`` wrapper (a profiler, say) to apply to
+everything run on a thread.
+"""
+import asyncio
+import concurrent.futures
+import inspect
+import threading
+import time
+import types
+
+QUEUE_SIZE = 256
+# The source thread hands items over in chunks, as crossing threads per item
+# costs more than parsing one: at most this many, or whatever it has after
+# this many seconds
+FEED_CHUNK = 64
+FEED_INTERVAL = 0.05
+# How often a blocked source thread checks whether the pipeline failed
+_POLL_SECONDS = 0.1
+_DONE = object()
+
+
+class _Stopped(Exception):
+    """The pipeline failed elsewhere; the source thread gives up."""
+
+
+def _thread_timed(fn, arg):
+    start = time.thread_time()
+    return fn(arg), time.thread_time() - start
+
+
+class Stage:
+    def __init__(self, name, fn, workers=1, batch=None, queue_size=QUEUE_SIZE):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.batch = batch
+        self.queue_size = queue_size
+        # Filled in by run_pipeline
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.cpu_seconds = 0.0
+
+    @types.coroutine
+    def _cpu_timed(self, coro):
+        # Drive ``coro``, timing only its steps: what runs between two awaits
+        send, arg = coro.send, None
+        while True:
+            start = time.thread_time()
+            try:
+                future = send(arg)
+            except StopIteration as e:
+                return e.value
+            finally:
+                self.cpu_seconds += time.thread_time() - start
+            try:
+                send, arg = coro.send, (yield future)
+            except BaseException as e:
+                send, arg = coro.throw, e
+
+    async def _call(self, arg, on_thread):
+        if inspect.iscoroutinefunction(self.fn):
+            return await self._cpu_timed(self.fn(arg))
+        fn = on_thread(self.fn) if on_thread is not None else self.fn
+        result, cpu = await asyncio.to_thread(_thread_timed, fn, arg)
+        self.cpu_seconds += cpu
+        return result
+
+    async def _take(self, inbox):
+        """The next item or batch, or _DONE once the stage's input has ended."""
+        item = await inbox.get()
+        if item is _DONE or not self.batch:
+            return item
+        items = [item]
+        while len(items) < self.batch and not inbox.empty():
+            item = inbox.get_nowait()
+            if item is _DONE:
+                # Put it back for this worker's next call
+                inbox.put_nowait(item)
+                break
+            items.append(item)
+        return items
+
+    async def _worker(self, inbox, outbox, on_thread):
+        while True:
+            arg = await self._take(inbox)
+            if arg is _DONE:
+                return
+            start = time.perf_counter()
+            result = await self._call(arg, on_thread)
+            self.busy_seconds += time.perf_counter() - start
+            self.items += len(arg) if self.batch else 1
+            if outbox is None or result is None:
+                continue
+            for item in (result if self.batch else (result,)):
+                await outbox.put(item)
+
+    async def _run(self, inbox, outbox, downstream_workers, on_thread):
+        await asyncio.gather(*(self._worker(inbox, outbox, on_thread)
+                               for _ in range(self.workers)))
+        for _ in range(downstream_workers):
+            await outbox.put(_DONE)
+
+
+def _feed(source, chunks, loop, stopped, stage):
+    # Runs on a thread: blocking puts give the source backpressure too
+    waited = 0.0
+
+    def put(chunk):
+        nonlocal waited
+        start = time.perf_counter()
+        future = asyncio.run_coroutine_threadsafe(chunks.put(chunk), loop)
+        try:
+            while True:
+                try:
+                    return future.result(_POLL_SECONDS)
+                except concurrent.futures.TimeoutError:
+                    if stopped.is_set():
+                        future.cancel()
+                        raise _Stopped()
+        finally:
+            waited += time.perf_counter() - start
+
+    start, cpu = time.perf_counter(), time.thread_time()
+    count = 0
+    chunk = []
+    started = time.monotonic()
+    try:
+        for item in source:
+            if not chunk:
+                started = time.monotonic()
+            chunk.append(item)
+            count += 1
+            if len(chunk) >= FEED_CHUNK or time.monotonic() - started >= FEED_INTERVAL:
+                put(chunk)
+                chunk = []
+        if chunk:
+            put(chunk)
+    finally:
+        # Time spent waiting for room downstream is not the source's
+        if stage is not None:
+            stage.items += count
+            stage.busy_seconds += time.perf_counter() - start - waited
+            stage.cpu_seconds += time.thread_time() - cpu
+    put(_DONE)
+
+
+async def _unchunk(chunks, inbox, workers):
+    while True:
+        chunk = await chunks.get()
+        if chunk is _DONE:
+            break
+        for item in chunk:
+            await inbox.put(item)
+    for _ in range(workers):
+        await inbox.put(_DONE)
+
+
+async def run_pipeline(source, stages, source_stage=None, on_thread=None):
+    """Push every item of ``source`` through ``stages``; see the module docstring.
+
+    ``source_stage``, a :class:`Stage` whose function is not used, gets the
+    counters for reading ``source``. ``on_thread(fn)`` returns what to call
+    in place of a function run on a thread, the source reader included.
+
+    Returns when the last stage has handled its last item. The first
+    exception in the source or any stage stops the whole pipeline and is
+    raised here.
+    """
+    loop = asyncio.get_running_loop()
+    stopped = threading.Event()
+    queues = [asyncio.Queue(stage.queue_size) for stage in stages] + [None]
+    chunks = asyncio.Queue(2)
+    feed = on_thread(_feed) if on_thread is not None else _feed
+    tasks = [asyncio.ensure_future(asyncio.to_thread(feed, source, chunks, loop, stopped,
+                                                     source_stage)),
+             asyncio.ensure_future(_unchunk(chunks, queues[0], stages[0].workers))]
+    for i, stage in enumerate(stages):
+        downstream = stages[i + 1].workers if i + 1 < len(stages) else 0
+        tasks.append(asyncio.ensure_future(stage._run(queues[i], queues[i + 1], downstream,
+                                                      on_thread)))
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if task.exception() is not None:
+                raise task.exception()
+    finally:
+        stopped.set()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,200 @@
+"""Publish stage: fingerprinted images, precompressed text and an asset manifest.
+
+:func:`publish_catalog` prepares the site's public directory for a server that
+caches hard:
+
+* every image the catalog refers to (``img``, ``srcset``, ``srcsetAvif``)
+  gets a copy named after its content under ``/static/``, e.g.
+  ``/images/products/a.jpg`` -> ``/static/images/products/a.3f9c0e12ab.jpg``.
+  Those URLs never change meaning, so they can be cached as immutable. The
+  copies are hard links where the filesystem allows; the logical paths keep
+  working, and copies no longer referenced are removed;
+* ``manifest_file`` maps each logical URL to its fingerprinted one, for the
+  client to resolve product images through;
+* JSON and other text files under the public directory (the shards, say)
+  get ``.gz`` and, with the ``brotli`` package installed, ``.br`` siblings,
+  compressed at the highest level on a process pool. Files already
+  compressed since their last change are skipped, and a sibling is only kept
+  when it is smaller than the original.
+
+Content hashes are cached in ``state_file`` by size and mtime.
+"""
+import gzip
+import importlib.util
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+from kanoha_import.manifest import file_sha256
+from kanoha_import.paths import PLACEHOLDER, atomic_open, atomic_write_json, load_json
+
+STATIC_PREFIX = "/static"
+HASH_LENGTH = 10
+TEXT_EXTENSIONS = ('.json', '.txt', '.xml', '.svg', '.html', '.css', '.js', '.map',
+                   '.webmanifest')
+ENCODINGS = ('gz', 'br')
+
+
+def _compress(data, encoding):
+    if encoding == 'br':
+        import brotli
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def compress_file(job):
+    """Write the compressed siblings of one file; runs in a worker process.
+
+    ``job`` is ``(path, encodings)``. Returns how many siblings were written.
+    """
+    path, encodings = job
+    with open(path, 'rb') as f:
+        data = f.read()
+    written = 0
+    for encoding in encodings:
+        target = f"{path}.{encoding}"
+        compressed = _compress(data, encoding)
+        if len(compressed) >= len(data):
+            if os.path.exists(target):
+                os.remove(target)
+            continue
+        with atomic_open(target, 'wb') as f:
+            f.write(compressed)
+        written += 1
+    return written
+
+
+def _is_fresh(target, st):
+    try:
+        return os.stat(target).st_mtime_ns >= st.st_mtime_ns
+    except OSError:
+        return False
+
+
+def compress_tree(root, workers=None, encodings=None):
+    """Precompress the text files under ``root``; returns ``(written, removed)``."""
+    if encodings is None:
+        encodings = tuple(e for e in ENCODINGS
+                          if e != 'br' or importlib.util.find_spec('brotli') is not None)
+    static_dir = os.path.join(root, STATIC_PREFIX.lstrip('/'))
+    jobs = []
+    removed = 0
+    for directory, dirs, names in os.walk(root):
+        if os.path.normpath(directory) == os.path.normpath(static_dir):
+            dirs[:] = []
+            continue
+        for name in names:
+            path = os.path.join(directory, name)
+            stem, ext = os.path.splitext(name)
+            if ext[1:] in ENCODINGS:
+                # A sibling whose source is gone
+                if stem.endswith(TEXT_EXTENSIONS) and not os.path.exists(path[:-len(ext)]):
+                    os.remove(path)
+                    removed += 1
+                continue
+            if not name.endswith(TEXT_EXTENSIONS):
+                continue
+            st = os.stat(path)
+            for encoding in ENCODINGS:
+                target = f"{path}.{encoding}"
+                if (encoding not in encodings and os.path.exists(target)
+                        and not _is_fresh(target, st)):
+                    # Left by a run that had the encoder; it would serve old content
+                    os.remove(target)
+                    removed += 1
+            stale = tuple(e for e in encodings if not _is_fresh(f"{path}.{e}", st))
+            if stale:
+                jobs.append((path, stale))
+    written = 0
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            written = sum(executor.map(compress_file, jobs, chunksize=16))
+    return written, removed
+
+
+def image_urls(product):
+    """The local image URLs a product refers to."""
+    urls = [product.get('img')]
+    for field in ('srcset', 'srcsetAvif'):
+        for entry in (product.get(field) or '').split(','):
+            urls.append(entry.strip().split(' ')[0])
+    return [url for url in urls if url and url.startswith('/')]
+
+
+def _hashed_url(url, digest):
+    stem, ext = os.path.splitext(url)
+    return f"{STATIC_PREFIX}{stem}.{digest[:HASH_LENGTH]}{ext}"
+
+
+def _place(source, target):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_path = f"{target}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, target)
+
+
+def fingerprint_images(products, public_dir, state_file, extra_urls=()):
+    """Place the fingerprinted copies; returns ``({url: hashed_url}, written, removed)``."""
+    state = load_json(state_file, {})
+    new_state = {}
+    assets = {}
+    written = 0
+    urls = [url for product in products for url in image_urls(product)] + list(extra_urls)
+    for url in urls:
+        if url in assets:
+            continue
+        source = os.path.join(public_dir, url.lstrip('/'))
+        try:
+            st = os.stat(source)
+        except OSError:
+            continue
+        entry = state.get(source)
+        if not entry or (entry['size'], entry['mtime_ns']) != (st.st_size, st.st_mtime_ns):
+            entry = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': file_sha256(source)}
+        new_state[source] = entry
+        assets[url] = _hashed_url(url, entry['sha256'])
+        target = os.path.join(public_dir, assets[url].lstrip('/'))
+        if not os.path.exists(target):
+            _place(source, target)
+            written += 1
+
+    removed = 0
+    keep = {os.path.normpath(os.path.join(public_dir, url.lstrip('/'))) for url in assets.values()}
+    for directory, _, names in os.walk(os.path.join(public_dir, STATIC_PREFIX.lstrip('/'))):
+        for name in names:
+            path = os.path.normpath(os.path.join(directory, name))
+            if path not in keep:
+                os.remove(path)
+                removed += 1
+
+    atomic_write_json(state_file, new_state)
+    return assets, written, removed
+
+
+def publish_catalog(products, public_dir, manifest_file, state_file, extra_urls=(), workers=None):
+    """Fingerprint the images, write ``manifest_file`` and precompress ``public_dir``."""
+    assets, linked, unlinked = fingerprint_images(products, public_dir, state_file, extra_urls)
+    atomic_write_json(manifest_file, dict(sorted(assets.items())), indent=2)
+    print(f"Published {len(assets)} images under {STATIC_PREFIX}/: {linked} new, "
+          f"{unlinked} removed; manifest in {manifest_file}")
+
+    if importlib.util.find_spec('brotli') is None:
+        print("brotli is not installed; writing .gz files only")
+    compressed, removed = compress_tree(public_dir, workers)
+    print(f"Precompressed {compressed} files, removed {removed} stale ones")
+    return assets
+
+
+def run(paths, workers=None):
+    """``publish``: publish the catalog in the site's products file."""
+    with open(paths.data_file, 'r') as f:
+        products = json.load(f)
+    publish_catalog(products, paths.public_dir, paths.asset_manifest_file,
+                    paths.publish_state_file, extra_urls=[PLACEHOLDER], workers=workers)
+    return 0
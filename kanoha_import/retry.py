@@ -0,0 +1,152 @@
+"""Retries with backoff, per-host circuit breakers and a deferred pass.
+
+A :class:`RetryScheduler` is shared by every download of a run:
+
+* a transient failure (network error, truncated body, 408/425/429/5xx) is
+  retried after an exponentially growing delay with full jitter, honouring
+  ``Retry-After`` when the origin sends one;
+* after ``threshold`` consecutive transient failures a host's circuit opens
+  and further requests to it fail at once, without taking a connection or a
+  worker, until ``cooldown`` seconds have passed; the next request is then
+  let through, and its outcome closes the circuit or opens it again;
+* whatever still failed transiently is queued with :meth:`defer` and tried
+  once more after the main pass, when the circuits have cooled down.
+
+The retry loops themselves live next to the fetchers:
+:meth:`RetryScheduler.call` for the blocking ones and
+:func:`kanoha_import.downloader.fetch_retrying` for asyncio.
+"""
+import email.utils
+import random
+import time
+from urllib.parse import urlparse
+
+from kanoha_import.partial import IncompleteDownload
+
+RETRY_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+class RetryableStatus(Exception):
+    """The origin answered with a status worth trying again later."""
+
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class CircuitOpen(Exception):
+    """The host has been failing; the request was not sent."""
+
+
+# Failures of a blocking fetch that may go away on their own; requests'
+# exceptions are all OSErrors
+TRANSIENT_ERRORS = (RetryableStatus, IncompleteDownload, CircuitOpen, OSError)
+
+
+def host_of(url):
+    return urlparse(url).netloc.lower()
+
+
+def retry_after_seconds(value):
+    """Seconds to wait from a ``Retry-After`` header (delta or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class CircuitBreaker:
+    """Per-host failure counting; see the module docstring."""
+
+    def __init__(self, threshold=5, cooldown=30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.opened = 0
+        self._failures = {}
+        self._open_until = {}
+
+    def allow(self, host):
+        return time.monotonic() >= self._open_until.get(host, 0.0)
+
+    def success(self, host):
+        self._failures.pop(host, None)
+        self._open_until.pop(host, None)
+
+    def failure(self, host):
+        failures = self._failures.get(host, 0) + 1
+        self._failures[host] = failures
+        # A host let through after its cooldown gets a single chance
+        if failures >= self.threshold:
+            if self.allow(host):
+                self.opened += 1
+            self._open_until[host] = time.monotonic() + self.cooldown
+
+    def wait_time(self):
+        """Seconds until every open circuit admits requests again."""
+        now = time.monotonic()
+        return max([until - now for until in self._open_until.values()] + [0.0])
+
+
+class RetryScheduler:
+    def __init__(self, attempts=4, base_delay=0.5, max_delay=30.0, threshold=5,
+                 cooldown=30.0, seed=None):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = CircuitBreaker(threshold, cooldown)
+        self.retries = self.short_circuited = self.deferred = self.recovered = 0
+        self._deferred = []
+        self._rng = random.Random(seed)
+
+    def delay(self, attempt, retry_after=None):
+        """Seconds to wait after failed attempt number ``attempt`` (from 0)."""
+        delay = self._rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    def call(self, url, fn):
+        """Run the blocking ``fn()`` for ``url``, retrying transient failures.
+
+        Raises the last error once the attempts run out, or
+        :class:`CircuitOpen` if the host's circuit is open.
+        """
+        host = host_of(url)
+        for attempt in range(self.attempts):
+            if not self.breaker.allow(host):
+                self.short_circuited += 1
+                raise CircuitOpen(f"circuit open for {host}")
+            try:
+                value = fn()
+            except TRANSIENT_ERRORS as e:
+                self.breaker.failure(host)
+                if attempt + 1 == self.attempts:
+                    raise
+                self.retries += 1
+                time.sleep(self.delay(attempt, getattr(e, 'retry_after', None)))
+                continue
+            self.breaker.success(host)
+            return value
+
+    def defer(self, item):
+        """Queue ``item`` for the pass after the main one."""
+        self._deferred.append(item)
+        self.deferred += 1
+
+    def take_deferred(self):
+        """Empty the deferred queue; wait ``breaker.wait_time()`` before retrying them."""
+        items, self._deferred = self._deferred, []
+        return items
+
+    def summary(self):
+        return (f"{self.retries} retries, {self.short_circuited} skipped by an open circuit "
+                f"({self.breaker.opened} opened), {self.recovered} of {self.deferred} recovered "
+                f"in the deferred pass")
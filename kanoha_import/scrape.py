@@ -0,0 +1,197 @@
+"""``scrape``: build the catalog from the storefront's shop pages."""
+import functools
+import json
+import time
+
+from kanoha_import.catalog import CatalogStore, report_shared_ids
+from kanoha_import.fetch import ImageFetcher
+from kanoha_import.html_backends import get_backend
+from kanoha_import.httpcache import DEFAULT_TTL, CachedSession, ResponseCache
+from kanoha_import.manifest import DownloadManifest
+from kanoha_import.paths import IMAGE_URL, clean_filename
+from kanoha_import.retry import RetryScheduler
+
+BASE_URL = "https://kanohagoods.com/shop/page/{}/"
+# Seconds the sequential scrape waits after each page it requested
+PAGE_DELAY = 2
+
+# Politeness budget for --crawl: average page requests per second (one every
+# 2 s, as the sequential scrape waits) and pages in flight
+CRAWL_RATE = 0.5
+CRAWL_PAGES_IN_FLIGHT = 4
+CRAWL_IMAGE_WORKERS = 8
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.5",
+    "Connection": "keep-alive",
+    "Upgrade-Insecure-Requests": "1",
+    "Cache-Control": "max-age=0",
+}
+
+
+def open_session():
+    """``requests.Session`` with the browser headers and connection retries."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    adapter = HTTPAdapter(max_retries=Retry(connect=3, backoff_factor=0.5))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update(HEADERS)
+    return session
+
+
+def parse_page(html, backend):
+    """Raw product fields for every item on one shop page."""
+    # Tries multiple selectors for products (.product, li.product, .type-product)
+    items = backend.extract(html)
+
+    found = []
+    for item in items:
+        try:
+            name = item['title'] if item['title'] is not None else item['h2']
+            img = item['img']
+
+            if name is not None:
+                img_url = None
+                if img is not None:
+                    img_url = img.get('data-src') or img.get('src')
+                    # Try to get largest image from srcset
+                    if img.get('srcset'):
+                        srcset = img.get('srcset').split(',')
+                        # Get the last one (usually largest)
+                        img_url = srcset[-1].strip().split(' ')[0]
+
+                # Category extraction
+                categories = [c.replace('product_cat-', '') for c in item['classes'] if c.startswith('product_cat-')]
+
+                found.append({
+                    "name": name,
+                    "price": item['price'] if item['price'] is not None else "Contact for Price",
+                    "img_url": img_url,
+                    "category": categories[0].replace('-', ' ').title() if categories else "General",
+                })
+        except Exception as e:
+            print(f"Error parsing item: {e}")
+    return found
+
+
+def make_product(item, product_id):
+    """Product record plus the image URL and local filename it should use."""
+    name = item["name"]
+    img_url = item["img_url"]
+
+    # Generate filename
+    img_ext = "jpg"
+    if img_url:
+        ext_match = img_url.split('.')[-1].split('?')[0]
+        if len(ext_match) <= 4: img_ext = ext_match
+
+    img_filename = f"{product_id}_{clean_filename(name)[:30]}.{img_ext}"
+
+    product = {
+        "id": product_id,
+        "name": name,
+        "price": item["price"],
+        "category": item["category"],
+        "img": IMAGE_URL + img_filename,
+        "description": f"Premium {name} available for immediate shipment.",
+        "features": ["Authentic", "Fast Shipping", "Wholesale Available"]
+    }
+    return product, img_url, img_filename
+
+
+def scrape_sequential(pages, base_url, total_pages, parse, fetch_image, delay=PAGE_DELAY):
+    products = []
+    for page in range(1, total_pages + 1):
+        print(f"Scraping page {page}/{total_pages}...")
+        from_cache = False
+        try:
+            response = pages.get(base_url.format(page), timeout=15)
+            from_cache = getattr(response, 'from_cache', False)
+            if response.status_code != 200:
+                print(f"Failed to load page {page}: Status {response.status_code}")
+                continue
+
+            items = parse(response.text)
+            print(f"Found {len(items)} items on page {page}")
+
+            for item in items:
+                product, img_url, img_filename = make_product(item, str(len(products) + 1))
+                product["img"] = fetch_image(img_url, img_filename, product)
+                products.append(product)
+
+        except Exception as e:
+            print(f"Error scraping page {page}: {e}")
+
+        if delay and not from_cache:
+            time.sleep(delay) # Wait between pages
+    fetch_image.retry_deferred()
+    return products
+
+
+def scrape_concurrent(paths, base_url, total_pages, parse, manifest, page_cache, max_age, retry,
+                      rate, pages_in_flight, image_workers):
+    # aiohttp is only imported by the commands that download
+    from kanoha_import.crawler import crawl
+
+    # Page fetches share a token bucket; images download on their own queue meanwhile
+    urls = [base_url.format(page) for page in range(1, total_pages + 1)]
+    print(f"Crawling {total_pages} pages at up to {rate} pages/s, {pages_in_flight} in flight...")
+    return crawl(urls, parse, make_product, paths.image_dir, rate=rate,
+                 pages_in_flight=pages_in_flight, image_workers=image_workers,
+                 headers=HEADERS, manifest=manifest, cache=page_cache,
+                 max_age=max_age, retry=retry)
+
+
+def run(paths, pages=5, base_url=BASE_URL, crawl=False, rate=CRAWL_RATE,
+        pages_in_flight=CRAWL_PAGES_IN_FLIGHT, image_workers=CRAWL_IMAGE_WORKERS, cache_dir=None,
+        cache_ttl=DEFAULT_TTL, refresh=False, replay=False, catalog=False):
+    paths.ensure()
+    manifest = DownloadManifest(paths.manifest_file)
+    # Image retries, per-host circuit breaker and the deferred pass
+    retry = RetryScheduler()
+    session = open_session()
+    # Shop pages go through the response cache; images are tracked by the manifest
+    page_cache = ResponseCache(cache_dir or paths.http_cache_dir, cache_ttl,
+                               'replay' if replay else 'refresh' if refresh else 'default')
+    # Images are revalidated on the same schedule as pages
+    max_age = page_cache.ttl if page_cache.mode == 'default' else None
+    parse = functools.partial(parse_page, backend=get_backend())
+
+    print(f"Starting scrape of {pages} pages...")
+    if crawl:
+        products = scrape_concurrent(paths, base_url, pages, parse, manifest, page_cache, max_age,
+                                     retry, rate, pages_in_flight, image_workers)
+    else:
+        fetch_image = ImageFetcher(session, paths.image_dir, manifest, retry, replay=replay,
+                                   max_age=max_age, timeout=10)
+        # Replay never reaches the origin, not even for the pages it misses
+        products = scrape_sequential(CachedSession(session, page_cache), base_url, pages, parse,
+                                     fetch_image, delay=0 if replay else PAGE_DELAY)
+
+    manifest.save()
+    print(f"Image downloads: {retry.summary()}")
+    print(f"Page cache: {page_cache.hits} hits, {page_cache.revalidated} revalidated, "
+          f"{page_cache.fetched} fetched")
+
+    # Save to JSON
+    if products and catalog:
+        with CatalogStore(paths.catalog_db) as store:
+            changed, removed = store.replace_source(products, 'scrape')
+            report_shared_ids(store)
+            exported = store.export_json(paths.data_file)
+        print(f"Scraping complete. {len(products)} products in {paths.catalog_db} "
+              f"({changed} updated, {removed} removed); {exported} exported to {paths.data_file}.")
+    elif products:
+        with open(paths.data_file, 'w') as f:
+            json.dump(products, f, indent=2)
+        print(f"Scraping complete. {len(products)} products saved to {paths.data_file}.")
+    else:
+        print("No products found.")
+        return 1
+    return 0
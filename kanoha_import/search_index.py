@@ -0,0 +1,78 @@
+"""Prebuilt prefix search index for the product list."""
+import hashlib
+import re
+import unicodedata
+
+from kanoha_import.paths import atomic_write_json, load_json
+
+MIN_PREFIX = 2
+MAX_PREFIX = 12
+# How much one occurrence counts towards a product's score for a term
+FIELD_WEIGHTS = (('name', 3), ('description', 1))
+
+_token = re.compile(r'[a-z0-9]+')
+
+
+def normalize(text):
+    """Lowercase, strip accents and split into alphanumeric tokens."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return _token.findall(text.lower())
+
+
+def document_terms(product):
+    """``{prefix: weight}`` for every edge n-gram of every token in a product."""
+    terms = {}
+    for field, weight in FIELD_WEIGHTS:
+        for token in normalize(product.get(field)):
+            if len(token) < MIN_PREFIX:
+                terms[token] = terms.get(token, 0) + weight
+                continue
+            for n in range(MIN_PREFIX, min(len(token), MAX_PREFIX) + 1):
+                prefix = token[:n]
+                terms[prefix] = terms.get(prefix, 0) + weight
+    return terms
+
+
+def _digest(product):
+    text = '\0'.join(product.get(field) or '' for field, _ in FIELD_WEIGHTS)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def build_search_index(products, index_file, state_file):
+    """Write a ``{prefix: [product positions]}`` index next to the catalog.
+
+    The output is ``{"version", "ids", "terms"}``: ``ids`` lists product ids
+    and each term maps to positions in ``ids``, highest-scoring first. A query
+    normalizes its words, looks each one up (the last one can be partial) and
+    intersects the lists, keeping the first list's order.
+
+    Per-product term weights are kept in ``state_file`` with a hash of the
+    indexed fields, so only added or changed products are re-tokenized.
+    Returns the number of products that were (re-)tokenized.
+    """
+    previous = load_json(state_file, {})
+
+    state = {}
+    postings = {}
+    tokenized = 0
+    for position, product in enumerate(products):
+        digest = _digest(product)
+        entry = previous.get(product['id'])
+        if entry is None or entry['digest'] != digest:
+            entry = {'digest': digest, 'terms': document_terms(product)}
+            tokenized += 1
+        state[product['id']] = entry
+        for term, weight in entry['terms'].items():
+            postings.setdefault(term, []).append((-weight, position))
+
+    index = {
+        'version': 1,
+        'ids': [p['id'] for p in products],
+        'terms': {term: [position for _, position in sorted(hits)]
+                  for term, hits in sorted(postings.items())},
+    }
+
+    atomic_write_json(index_file, index, separators=(',', ':'))
+    atomic_write_json(state_file, state)
+    return tokenized
@@ -0,0 +1,128 @@
+"""Sharded catalog output: a small manifest plus per-page and per-product files."""
+import json
+import os
+import re
+
+from kanoha_import.paths import write_if_changed
+
+PAGE_SIZE = 48
+# Fields the product grid needs; everything else only lives in the detail file
+LIST_FIELDS = ('id', 'name', 'price', 'category', 'img', 'srcset', 'width', 'height', 'color',
+               'lqip')
+
+
+def slugify(name):
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-') or 'uncategorized'
+
+
+def _dumps(data):
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+
+
+def list_record(product):
+    """The fields of ``product`` that go into the list pages."""
+    return {k: product[k] for k in LIST_FIELDS if k in product}
+
+
+class ShardWriter:
+    """Write shards one at a time, then the manifest, then prune the rest.
+
+    Pages are written as they fill up, so a caller that streams its products
+    (see :meth:`CatalogStore.export_sharded
+    <kanoha_import.catalog.CatalogStore.export_sharded>`) never holds more
+    than one page of them.
+    """
+
+    def __init__(self, out_dir, page_size=PAGE_SIZE):
+        self.out_dir = out_dir
+        self.page_size = page_size
+        self.written = 0
+        self._keep = set()
+        self._slugs = set()
+
+    def write(self, path, data):
+        full_path = os.path.join(self.out_dir, path)
+        self._keep.add(os.path.normpath(full_path))
+        self.written += write_if_changed(full_path, _dumps(data))
+
+    def write_product(self, product):
+        self.write(f"products/{product['id']}.json", product)
+
+    def write_pages(self, prefix, records):
+        """Page ``records`` under ``prefix``; returns ``(count, page paths)``."""
+        paths = []
+        page = []
+        count = 0
+        for record in records:
+            page.append(record)
+            count += 1
+            if len(page) == self.page_size:
+                paths.append(self._write_page(prefix, len(paths) + 1, page))
+                page = []
+        if page:
+            paths.append(self._write_page(prefix, len(paths) + 1, page))
+        return count, paths
+
+    def _write_page(self, prefix, number, records):
+        path = f"{prefix}/page-{number}.json"
+        self.write(path, records)
+        return path
+
+    def write_categories(self, groups):
+        """Page each ``(name, records)`` of ``groups``, in name order; returns the manifest entries."""
+        categories = []
+        for name, records in groups:
+            slug = base = slugify(name)
+            n = 2
+            while slug in self._slugs:
+                slug = f"{base}-{n}"
+                n += 1
+            self._slugs.add(slug)
+            count, pages = self.write_pages(f"category/{slug}", records)
+            categories.append({'name': name, 'slug': slug, 'count': count, 'pages': pages})
+        return categories
+
+    def finish(self, count, pages, categories):
+        """Write the manifest and remove unreferenced shards; returns ``(written, removed)``."""
+        self.write('manifest.json', {
+            'version': 1,
+            'count': count,
+            'pageSize': self.page_size,
+            'pages': pages,
+            'categories': categories,
+            'product': 'products/{id}.json',
+        })
+        removed = 0
+        for root, _, names in os.walk(self.out_dir):
+            for name in names:
+                path = os.path.normpath(os.path.join(root, name))
+                if name.endswith('.json') and path not in self._keep:
+                    os.remove(path)
+                    removed += 1
+        return self.written, removed
+
+
+def write_sharded(products, out_dir, page_size=PAGE_SIZE):
+    """Write the catalog under ``out_dir`` as independently fetchable shards.
+
+    Layout (all paths in the manifest are relative to ``out_dir``)::
+
+        manifest.json                  categories, counts and shard lists
+        all/page-N.json                list records for the whole catalog
+        category/<slug>/page-N.json    list records for one category
+        products/<id>.json             the full product record
+
+    Only files whose content changed are rewritten, and shards that are no
+    longer referenced are removed. Returns ``(written, removed)`` counts.
+    """
+    writer = ShardWriter(out_dir, page_size)
+    summaries = [list_record(p) for p in products]
+    count, pages = writer.write_pages('all', summaries)
+
+    by_category = {}
+    for summary in summaries:
+        by_category.setdefault(summary['category'], []).append(summary)
+    categories = writer.write_categories((name, by_category[name]) for name in sorted(by_category))
+    for product in products:
+        writer.write_product(product)
+    return writer.finish(count, pages, categories)
@@ -0,0 +1,77 @@
+"""Check that every product points at an intact local image."""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from kanoha_import.imageinfo import ImageError, probe
+
+CHUNK = 256
+
+
+def directory_snapshot(directory):
+    """Names of the regular files in ``directory``, from a single scandir."""
+    try:
+        with os.scandir(directory) as entries:
+            return {entry.name for entry in entries if entry.is_file()}
+    except FileNotFoundError:
+        return set()
+
+
+def _probe_chunk(paths):
+    results = []
+    for path in paths:
+        try:
+            results.append((path, probe(path), None))
+        except (ImageError, OSError) as e:
+            results.append((path, None, str(e)))
+    return results
+
+
+def probe_all(paths, workers=16):
+    """``{path: (info, error)}`` for each path, probed in chunks on a thread pool."""
+    paths = list(paths)
+    chunks = [paths[i:i + CHUNK] for i in range(0, len(paths), CHUNK)]
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for chunk in executor.map(_probe_chunk, chunks):
+            for path, info, error in chunk:
+                results[path] = (info, error)
+    return results
+
+
+def validate_products(products, public_dir, workers=16):
+    """Split ``products`` into ``(valid, bad)``.
+
+    Existence is answered from one directory listing per image folder rather
+    than a stat per product; the files that exist then have their headers
+    and trailers checked in parallel. Each ``bad`` entry is a dict with the
+    product's id, name, img and the reason it was rejected.
+    """
+    snapshots = {}
+    located = []
+    for product in products:
+        image_url = product.get('img')
+        if not image_url:
+            located.append((product, None, "no image"))
+            continue
+        # "/images/products/x.jpg" -> "<public_dir>/images/products/x.jpg"
+        full_path = os.path.join(public_dir, image_url.lstrip('/'))
+        directory, name = os.path.split(full_path)
+        if directory not in snapshots:
+            snapshots[directory] = directory_snapshot(directory)
+        if name not in snapshots[directory]:
+            located.append((product, None, "image not found"))
+        else:
+            located.append((product, full_path, None))
+
+    probes = probe_all({path for _, path, _ in located if path}, workers)
+
+    valid, bad = [], []
+    for product, path, reason in located:
+        if path is not None:
+            reason = probes[path][1]
+        if reason is None:
+            valid.append(product)
+        else:
+            bad.append({'id': product.get('id'), 'name': product.get('name'),
+                        'img': product.get('img'), 'reason': reason})
+    return valid, bad
@@ -0,0 +1,133 @@
+"""Streaming access to WordPress WXR exports."""
+import io
+import mmap
+import os
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+namespaces = {
+    'wp': 'http://wordpress.org/export/1.2/',
+    'content': 'http://purl.org/rss/1.0/modules/content/',
+    'excerpt': 'http://wordpress.org/export/1.2/excerpt/'
+}
+
+# Target size of the byte ranges map_items() hands to each worker
+CHUNK_BYTES = 8 * 1024 * 1024
+
+
+def iter_items(xml_file):
+    """Yield every <item> of the export as soon as it has been parsed.
+
+    Each item is cleared and detached from <channel> once the caller moves on,
+    so memory stays flat regardless of the export size. Do not keep references
+    to the yielded element (or its children) past the current iteration.
+    """
+    channel = None
+    for event, elem in ET.iterparse(xml_file, events=('start', 'end')):
+        if event == 'start':
+            if elem.tag == 'channel':
+                channel = elem
+            continue
+        if elem.tag == 'item':
+            yield elem
+            elem.clear()
+            if channel is not None:
+                # Drops the finished item plus any channel metadata seen so far
+                channel.clear()
+
+
+def postmeta(item):
+    """Return an item's <wp:postmeta> as a {meta_key: meta_value} dict.
+
+    Built in a single scan so any number of keys can be looked up afterwards
+    without rescanning. The first occurrence of a key wins.
+    """
+    meta = {}
+    for entry in item.iterfind('wp:postmeta', namespaces):
+        key_el = entry.find('wp:meta_key', namespaces)
+        key = key_el.text if key_el is not None else None
+        if key is None or key in meta:
+            continue
+        value_el = entry.find('wp:meta_value', namespaces)
+        meta[key] = value_el.text if value_el is not None else None
+    return meta
+
+
+def _next_item(mm, origin, pos, limit):
+    # Offset of the first "</item>" + whitespace + "<item>" boundary after pos
+    # that is not inside a CDATA section (counted from origin, which is not).
+    while True:
+        close = mm.find(b'</item>', pos, limit)
+        if close < 0:
+            return limit
+        start = close + len(b'</item>')
+        while start < limit and mm[start:start + 1] in b' \t\r\n':
+            start += 1
+        if mm[start:start + 6] == b'<item>':
+            scanned = mm[origin:start]
+            if scanned.count(b'<![CDATA[') == scanned.count(b']]>'):
+                return start
+        pos = start
+
+
+def split_items(xml_file, chunk_bytes=CHUNK_BYTES):
+    """Split an export into byte ranges that each hold whole ``<item>``s.
+
+    Returns ``(header, ranges)``: the bytes up to and including the
+    ``<channel>`` start tag, which every range needs in front of it to parse
+    with the right namespaces, and ``(start, end)`` offsets in file order.
+    """
+    with open(xml_file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b'', []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            first = mm.find(b'<item>')
+            if first < 0:
+                return b'', []
+            channel = mm.rfind(b'<channel', 0, first)
+            header = mm[:mm.find(b'>', channel) + 1]
+            last = mm.rfind(b'</item>') + len(b'</item>')
+            ranges = []
+            start = first
+            while start < last:
+                end = _next_item(mm, start, min(start + chunk_bytes, last), last)
+                ranges.append((start, end))
+                start = end
+    return header, ranges
+
+
+def _map_chunk(task):
+    xml_file, header, start, end, fn = task
+    with open(xml_file, 'rb') as f:
+        f.seek(start)
+        body = f.read(end - start)
+    document = io.BytesIO(header + body + b'</channel></rss>')
+    results = []
+    for item in iter_items(document):
+        result = fn(item)
+        if result is not None:
+            results.append(result)
+    return results
+
+
+def map_items(xml_file, fn, workers=None, chunk_bytes=CHUNK_BYTES):
+    """Yield ``fn(item)`` for every item, parsing the export on a process pool.
+
+    The file is split at item boundaries (:func:`split_items`) and each range
+    is parsed by a worker; results come back in file order, exactly as
+    ``map(fn, iter_items(xml_file))`` would produce them, with ``None``
+    results dropped. ``fn`` must be a picklable top-level function and its
+    results picklable. Exports smaller than one chunk, or ``workers=1``, are
+    parsed in this process.
+    """
+    header, ranges = split_items(xml_file, chunk_bytes)
+    if workers == 1 or len(ranges) <= 1:
+        for item in iter_items(xml_file):
+            result = fn(item)
+            if result is not None:
+                yield result
+        return
+    tasks = [(xml_file, header, start, end, fn) for start, end in ranges]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for results in executor.map(_map_chunk, tasks):
+            yield from results
@@ -0,0 +1,333 @@
+"""``xml attachments``: import the WXR export's attachments as products.
+
+The export is parsed, categorized and its images downloaded as one streaming
+pipeline (see :func:`stream_images`), then the optional stages run over the
+whole catalog: dedupe, image variants, catalog store, compact formats,
+search index and shards.
+"""
+import asyncio
+import json
+import os
+import xml.etree.ElementTree as ET
+from urllib.parse import urlparse
+
+from kanoha_import.catalog import CatalogStore, report_shared_ids
+from kanoha_import.categorize import categorize_many, categorize_product
+from kanoha_import.compact import write_compact
+from kanoha_import.incremental import ImportState, item_digest
+from kanoha_import.manifest import DownloadManifest
+from kanoha_import.metrics import RunMetrics
+from kanoha_import.paths import PLACEHOLDER, clean_filename, load_json, write_if_changed
+from kanoha_import.pipeline import Stage, run_pipeline
+from kanoha_import.retry import RetryScheduler
+from kanoha_import.search_index import build_search_index
+from kanoha_import.shards import write_sharded
+from kanoha_import.wxr import iter_items, map_items, namespaces
+
+# Download concurrency: connections overall and per image host
+DOWNLOAD_LIMIT = 32
+DOWNLOAD_PER_HOST = 8
+# Titles per categorize_many() call in the streaming pipeline
+CATEGORIZE_BATCH = 256
+
+def load_previous_products(data_file):
+    return {p['id']: p for p in load_json(data_file, [])}
+
+def attachment_record(item, categorize=False):
+    """(post_id, title, url, modified, category) for an importable attachment, else None."""
+    post_type = item.find('wp:post_type', namespaces).text
+    if post_type != 'attachment':
+        return None
+    title = item.find('title').text
+    post_id = item.find('wp:post_id', namespaces).text
+    attachment_url = item.find('wp:attachment_url', namespaces).text
+    if not title or not attachment_url:
+        return None
+    modified = item.findtext('wp:post_modified_gmt', None, namespaces)
+    return post_id, title, attachment_url, modified, categorize_product(title) if categorize else None
+
+def categorized_attachment_record(item):
+    return attachment_record(item, categorize=True)
+
+def build_products(records, state, previous, products, counts, held=None):
+    """Append a product per record to ``products``, yielding those that need their image.
+
+    Yields ``(product, url, filename)``; products reused unchanged from the
+    last run are appended without being yielded. With a ``held`` dict,
+    unchanged items the last ``--dedupe merge`` left out go there by post id
+    instead (see :func:`revive_merged`).
+    """
+    for record in records:
+        if record is None:
+            continue
+        post_id, title, attachment_url, modified, category = record
+        digest = item_digest(title, attachment_url)
+        old = previous.get(post_id)
+        unchanged = state.is_unchanged(post_id, modified, digest)
+        state.mark(post_id, modified, digest)
+
+        if held is not None and unchanged and post_id in state.previous_merged:
+            held[post_id] = record
+            state.merged[post_id] = state.previous_merged[post_id]
+            continue
+
+        # Reuse last run's entry unless the item changed or its image failed
+        if unchanged and old is not None and old['img'] != PLACEHOLDER:
+            products.append(old)
+            continue
+        if post_id in state.previous:
+            counts['changed'] += 1
+        else:
+            counts['added'] += 1
+
+        ext = os.path.splitext(urlparse(attachment_url).path)[1]
+        if not ext: ext = ".jpg"
+        filename = f"{post_id}_{clean_filename(title)[:30]}{ext}"
+
+        product = {
+            "id": post_id,
+            "name": title,
+            "price": "Contact for Price",
+            "category": category, # None: filled in by the categorize stage, in batches
+            "img": f"/images/products/{filename}", # Assume success or placeholder will replace file content
+            "description": f"High-quality {title} available for wholesale.",
+            "features": ["Authentic", "Fast Shipping"]
+        }
+        products.append(product)
+        yield product, attachment_url, filename
+
+def revive_merged(held, state, products):
+    """The held records whose product they were merged into changed or is gone."""
+    present = {p['id'] for p in products}
+    revived = []
+    for post_id, record in held.items():
+        keeper = state.merged[post_id]
+        if not (state.kept(keeper) and keeper in present):
+            del state.merged[post_id]
+            revived.append(record)
+    return revived
+
+async def stream_images(new_products, image_dir, metrics, manifest, retry, replay, max_age,
+                        totals):
+    """Categorize, download and check images while the export is still being parsed.
+
+    parse -> categorize -> download -> validate, over bounded queues (see
+    kanoha_import.pipeline); returns the stages, parse first, for their
+    counters. Work on the pipeline's threads is profiled with ``metrics``.
+    """
+    # aiohttp is only imported by the commands that download
+    from kanoha_import.downloader import fetch_retrying, offline_result, open_session
+    slots = asyncio.Semaphore(DOWNLOAD_LIMIT)
+
+    def categorize(batch):
+        uncategorized = [p for p, _, _ in batch if p['category'] is None]
+        for p, category in zip(uncategorized, categorize_many([p['name'] for p in uncategorized])):
+            p['category'] = category
+        return batch
+
+    async def download(item):
+        product, url, filename = item
+        path = os.path.join(image_dir, filename)
+        if replay:
+            # Offline: whatever a previous run left on disk
+            return product, offline_result(url, path)
+        return product, await fetch_retrying(session, url, path, manifest, max_age, retry, slots)
+
+    async def validate(item, defer=True):
+        product, result = item
+        if result.ok:
+            if result.status == 304:
+                metrics.incr('cache_hits', reason='not modified')
+            elif result.skipped:
+                metrics.incr('cache_hits', reason='offline' if replay else 'fresh')
+            else:
+                metrics.incr('images_downloaded')
+                metrics.incr('bytes_downloaded', result.size)
+            return
+        if result.transient and defer:
+            # Tried once more after the main pass
+            retry.defer((product, result.url, os.path.basename(result.path)))
+            return
+        print(f"Error downloading {result.url}: {result.error}")
+        totals['failed'] += 1
+        metrics.incr('download_failures', reason=result.error.split(':')[0])
+        # Keep serving the copy from a previous run, if any
+        if not (os.path.exists(result.path) and os.path.getsize(result.path) > 0):
+            product['img'] = PLACEHOLDER
+            metrics.incr('placeholders')
+
+    parse = Stage('parse', None)
+    stages = [Stage('categorize', categorize, batch=CATEGORIZE_BATCH),
+              Stage('download', download, workers=DOWNLOAD_LIMIT),
+              Stage('validate', validate)]
+    async with open_session(DOWNLOAD_LIMIT, DOWNLOAD_PER_HOST) as session:
+        await run_pipeline(new_products, stages, parse, on_thread=metrics.profiled)
+        deferred = retry.take_deferred()
+        if deferred:
+            print(f"Retrying {len(deferred)} images after the main pass...")
+            await asyncio.sleep(retry.breaker.wait_time())
+            for item, (product, result) in zip(deferred, await asyncio.gather(
+                    *(download(item) for item in deferred))):
+                retry.recovered += result.ok
+                await validate((product, result), defer=False)
+    totals['images'] += stages[0].items
+    return [parse] + stages
+
+def run(paths, incremental=False, optimize=False, avif=False, image_meta=False,
+        search_index=False, sharded=False, replay=False, max_age=None, profile=None,
+        metrics_textfile=None, parse_workers=1, compact=(), dedupe=None, catalog=False,
+        publish=False):
+    """Import the attachments; returns the exit status, non-zero if the XML could not be read."""
+    metrics = RunMetrics('xml_v3', profile, paths.profile_dir)
+    try:
+        return run_import(paths, metrics, incremental, optimize, avif, image_meta, search_index,
+                          sharded, replay, max_age, parse_workers, compact, dedupe, catalog,
+                          publish)
+    finally:
+        metrics.write_json(paths.report_file)
+        print(f"Run report written to {paths.report_file}")
+        if metrics_textfile:
+            metrics.write_prometheus(metrics_textfile)
+
+def run_import(paths, metrics, incremental, optimize, avif, image_meta, search_index, sharded,
+               replay, max_age, parse_workers, compact, dedupe, catalog, publish):
+    paths.ensure()
+
+    print("Parsing XML file, downloading images as they are found...")
+    products = []
+    counts = {'added': 0, 'changed': 0}
+    state = ImportState(paths.state_file)
+    previous = {}
+    if incremental and catalog:
+        # products.json also holds the other sources' products, whose ids may clash
+        with CatalogStore(paths.catalog_db) as store:
+            previous = {p['id']: p for p in store.products('wxr')}
+    elif incremental:
+        previous = load_previous_products(paths.data_file)
+    if parse_workers == 1:
+        records = map(attachment_record, iter_items(paths.xml_file))
+    else:
+        # Workers parse and categorize byte ranges; results arrive in file order
+        records = map_items(paths.xml_file, categorized_attachment_record, parse_workers or None)
+    manifest = None if replay else DownloadManifest(paths.manifest_file)
+    retry = RetryScheduler()
+    totals = {'images': 0, 'failed': 0}
+    # Unchanged items a previous merge left out stay out, unless their keeper changed
+    held = {} if incremental and dedupe == 'merge' else None
+
+    # Process attachments as products
+    try:
+        with metrics.stage('pipeline'):
+            stages = asyncio.run(stream_images(
+                build_products(records, state, previous, products, counts, held),
+                paths.image_dir, metrics, manifest, retry, replay, max_age, totals))
+            revived = revive_merged(held, state, products) if held else []
+            if revived:
+                print(f"Re-importing {len(revived)} merged items whose product changed or was deleted...")
+                stages += asyncio.run(stream_images(
+                    build_products(revived, state, previous, products, counts),
+                    paths.image_dir, metrics, manifest, retry, replay, max_age, totals))
+    except (ET.ParseError, OSError) as e:
+        print(f"Error parsing XML: {e}")
+        metrics.incr('failures', reason='xml parse')
+        return 1
+    finally:
+        if manifest is not None:
+            manifest.save()
+    for stage in stages:
+        metrics.add_stage(stage.name, stage.busy_seconds, stage.cpu_seconds)
+        metrics.incr('pipeline_busy_seconds', round(stage.busy_seconds, 6), reason=stage.name)
+        metrics.incr('pipeline_items', stage.items, reason=stage.name)
+    metrics.incr('products', len(products))
+    metrics.incr('products_reused', len(products) - totals['images'])
+    if not replay:
+        print(f"Retries: {retry.summary()}")
+        for name in ('retries', 'short_circuited', 'deferred', 'recovered'):
+            metrics.incr(f"download_{name}", getattr(retry, name))
+        metrics.incr('download_circuits_opened', retry.breaker.opened)
+
+    deleted = state.deleted()
+    if incremental:
+        print(f"Found {len(products)} products: {counts['added']} added, {counts['changed']} changed, "
+              f"{len(deleted)} deleted" + (f", {len(state.merged)} merged." if held else "."))
+    if incremental and not totals['images'] and not deleted:
+        # Nothing to download, but the requested outputs may not exist yet
+        print("No changes since the last import.")
+    else:
+        print(f"Found {len(products)} products. Downloaded {totals['images'] - totals['failed']} "
+              f"images, {totals['failed']} failed.")
+
+    if dedupe:
+        # NumPy is only needed for this stage
+        from kanoha_import.dedupe import dedupe_products
+        with metrics.stage('dedupe'):
+            found = products
+            products, duplicates, unused = dedupe_products(products, paths.image_dir,
+                                                           paths.dedupe_state_file, dedupe)
+        metrics.incr('duplicates', duplicates)
+        if dedupe == 'merge':
+            # Remembered, so the next incremental run does not import them again
+            kept = {id(p) for p in products}
+            for product in found:
+                if id(product) not in kept:
+                    state.merged[product['id']] = product['duplicateOf']
+
+    if optimize:
+        # Resized WebP/AVIF variants and a srcset for the product grid (Pillow, imported late)
+        from kanoha_import.optimize import optimize_products
+        with metrics.stage('optimize'):
+            optimize_products(products, paths.image_dir, paths.optimized_dir,
+                              paths.optimize_state_file, avif=avif)
+    if image_meta:
+        # Dimensions, dominant color and a blurred placeholder for the grid
+        from kanoha_import.imagemeta import annotate_products
+        with metrics.stage('image_meta'):
+            metrics.incr('images_measured', annotate_products(products, paths.image_dir,
+                                                              paths.image_meta_state_file))
+
+    # Save to JSON
+    if catalog:
+        # The store may also hold other sources' products; every output covers all of them
+        with metrics.stage('catalog'), CatalogStore(paths.catalog_db) as store:
+            changed, removed = store.replace_source(products, 'wxr')
+            print(f"Catalog {paths.catalog_db}: {changed} products updated, {removed} removed")
+            report_shared_ids(store)
+            with metrics.stage('write_json'):
+                store.export_json(paths.data_file)
+            if sharded:
+                with metrics.stage('shards'):
+                    written, removed = store.export_sharded(paths.shard_dir)
+            # The other outputs are whole-catalog documents; only they need it in memory
+            products = list(store.products()) if compact or search_index or publish else None
+    else:
+        with metrics.stage('write_json'):
+            write_if_changed(paths.data_file, json.dumps(products, indent=2))
+        if sharded:
+            with metrics.stage('shards'):
+                written, removed = write_sharded(products, paths.shard_dir)
+    print(f"Saved to {paths.data_file}")
+    if sharded:
+        print(f"Sharded catalog in {paths.shard_dir}: {written} files written, {removed} removed")
+    if dedupe == 'merge':
+        # Only now that the merged catalog is saved
+        for path in unused:
+            os.remove(path)
+        print(f"Deleted {len(unused)} images only merged products used.")
+    if compact:
+        with metrics.stage('compact'):
+            for fmt in compact:
+                path = f"{os.path.splitext(paths.data_file)[0]}.compact.{fmt}"
+                size = write_compact(products, path)
+                print(f"Compact catalog saved to {path} ({size} bytes)")
+    if search_index:
+        with metrics.stage('search_index'):
+            tokenized = build_search_index(products, paths.search_index_file,
+                                           paths.search_state_file)
+        print(f"Search index saved to {paths.search_index_file} ({tokenized} products re-indexed)")
+    if publish:
+        from kanoha_import.publish import publish_catalog
+        with metrics.stage('publish'):
+            publish_catalog(products, paths.public_dir, paths.asset_manifest_file,
+                            paths.publish_state_file, extra_urls=[PLACEHOLDER])
+    state.save()
+    return 0
@@ -1,111 +1,7 @@
-import xml.etree.ElementTree as ET
-import json
-import os
-import requests
-import re
-from urllib.parse import urlparse
+"""Import WXR attachments as products; see ``python -m kanoha_import xml attachments --help``."""
+import sys
 
-XML_FILE = "/home/ubuntu/upload/pasted_file_GyHyAY_kanohagoods.WordPress.2026-01-06.xml"
-IMAGE_DIR = "/home/ubuntu/kanoha-import/client/public/images/products/"
-DATA_FILE = "/home/ubuntu/kanoha-import/client/src/data/products.json"
-
-# Ensure directories exist
-os.makedirs(IMAGE_DIR, exist_ok=True)
-os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
-
-namespaces = {
-    'wp': 'http://wordpress.org/export/1.2/',
-    'content': 'http://purl.org/rss/1.0/modules/content/',
-    'excerpt': 'http://wordpress.org/export/1.2/excerpt/'
-}
-
-def clean_filename(name):
-    return re.sub(r'[\\/*?:"<>|]', "", name).replace(" ", "_")
-
-def download_image(url, filename):
-    if not url: return "/images/products/placeholder.webp"
-    
-    local_path = os.path.join(IMAGE_DIR, filename)
-    if os.path.exists(local_path) and os.path.getsize(local_path) > 0:
-        return f"/images/products/{filename}"
-
-    try:
-        response = requests.get(url, stream=True, timeout=10)
-        if response.status_code == 200:
-            with open(local_path, 'wb') as f:
-                for chunk in response.iter_content(1024):
-                    f.write(chunk)
-            return f"/images/products/{filename}"
-    except Exception as e:
-        print(f"Error downloading {url}: {e}")
-    
-    return "/images/products/placeholder.webp"
-
-def categorize_product(title):
-    title_lower = title.lower()
-    if any(x in title_lower for x in ['earbud', 'headphone', 'speaker', 'audio', 'sound', 'mic']):
-        return "Audio"
-    if any(x in title_lower for x in ['adapter', 'plug', 'cable', 'charger', 'usb', 'power']):
-        return "Electronics Accessories"
-    if any(x in title_lower for x in ['kitchen', 'cook', 'pan', 'pot', 'knife', 'blender']):
-        return "Kitchenware"
-    if any(x in title_lower for x in ['toy', 'game', 'puzzle', 'doll']):
-        return "Toys & Games"
-    if any(x in title_lower for x in ['bag', 'case', 'backpack', 'tote']):
-        return "Bags & Cases"
-    return "General Merchandise"
-
-def parse_xml():
-    print("Parsing XML file...")
-    try:
-        tree = ET.parse(XML_FILE)
-        root = tree.getroot()
-        channel = root.find('channel')
-    except Exception as e:
-        print(f"Error parsing XML: {e}")
-        return
-
-    products = []
-    
-    # Process attachments as products
-    for item in channel.findall('item'):
-        post_type = item.find('wp:post_type', namespaces).text
-        
-        if post_type == 'attachment':
-            title = item.find('title').text
-            post_id = item.find('wp:post_id', namespaces).text
-            attachment_url = item.find('wp:attachment_url', namespaces).text
-            
-            if not title or not attachment_url:
-                continue
-
-            # Skip generic filenames as titles if possible, but here we have no choice
-            
-            # Auto-categorize
-            category = categorize_product(title)
-            
-            # Download Image
-            ext = os.path.splitext(urlparse(attachment_url).path)[1]
-            if not ext: ext = ".jpg"
-            filename = f"{post_id}_{clean_filename(title)[:30]}{ext}"
-            local_image_path = download_image(attachment_url, filename)
-            
-            products.append({
-                "id": post_id,
-                "name": title,
-                "price": "Contact for Price",
-                "category": category,
-                "img": local_image_path,
-                "description": f"High-quality {title} available for wholesale.",
-                "features": ["Authentic", "Fast Shipping"]
-            })
-
-    print(f"Found {len(products)} products from attachments.")
-    
-    # Save to JSON
-    with open(DATA_FILE, 'w') as f:
-        json.dump(products, f, indent=2)
-    print(f"Saved to {DATA_FILE}")
+from kanoha_import.cli import main
 
 if __name__ == "__main__":
-    parse_xml()
+    sys.exit(main(['xml', 'attachments'] + sys.argv[1:]))
@@ -1,4 +1,5 @@
 import express from "express";
+import fs from "fs";
 import { createServer } from "http";
 import path from "path";
 import { fileURLToPath } from "url";
@@ -16,6 +17,30 @@ async function startServer() {
       ? path.resolve(__dirname, "public")
       : path.resolve(__dirname, "..", "dist", "public");
 
+  // Written by the publish stage: .br/.gz beside text files, and content-hashed
+  // copies under /static/ whose URLs never change meaning
+  app.use((req, res, next) => {
+    if (req.method !== "GET" && req.method !== "HEAD") return next();
+    const encoding = req.acceptsEncodings("br", "gzip");
+    if (encoding !== "br" && encoding !== "gzip") return next();
+    let filePath: string;
+    try {
+      filePath = path.join(staticPath, decodeURIComponent(req.path));
+    } catch {
+      return next();
+    }
+    const compressed = `${filePath}.${encoding === "br" ? "br" : "gz"}`;
+    if (!filePath.startsWith(staticPath + path.sep) || !fs.existsSync(compressed)) return next();
+    res.vary("Accept-Encoding");
+    res.setHeader("Content-Encoding", encoding);
+    res.type(path.extname(filePath));
+    res.sendFile(compressed, (err) => err && next(err));
+  });
+
+  app.use(
+    "/static",
+    express.static(path.join(staticPath, "static"), { immutable: true, maxAge: "1y", fallthrough: false })
+  );
   app.use(express.static(staticPath));
 
   // Handle client-side routing - serve index.html for all routes
@@ -0,0 +1,89 @@
+"""``CatalogStore``: per-source keys, the version 1 migration and the streamed exports."""
+import json
+import os
+import sqlite3
+
+from kanoha_import.catalog import CatalogStore
+from kanoha_import.shards import write_sharded
+
+
+def product(i, **fields):
+    record = {'id': str(i), 'name': f"Item {i}", 'price': "Contact for Price",
+              'category': ["Audio", "Kitchenware", "Toys"][i % 3],
+              'img': f"/images/products/{i}.jpg", 'description': f"Item {i} for wholesale."}
+    record.update(fields)
+    return record
+
+
+WXR = [product(i) for i in range(1, 120)]
+SCRAPED = [product(i, name=f"Scraped {i}") for i in range(1, 60)]
+
+
+def test_sources_keep_their_own_ids(tmp_path):
+    with CatalogStore(str(tmp_path / 'catalog.sqlite')) as store:
+        store.replace_source(WXR, 'wxr')
+        assert store.replace_source(SCRAPED, 'scrape') == (len(SCRAPED), 0)
+
+        assert store.count('wxr') == len(WXR) and store.count('scrape') == len(SCRAPED)
+        assert store.get('wxr', '7')['name'] == "Item 7"
+        assert store.get('scrape', '7')['name'] == "Scraped 7"
+        assert store.update('scrape', '7', category="Sale")['category'] == "Sale"
+        assert store.get('wxr', '7')['category'] == "Kitchenware"
+        assert store.delete([('wxr', '7')]) == 1
+        assert store.get('scrape', '7') is not None
+        assert store.shared_ids()[:3] == ['1', '10', '11']
+        assert store.search('scraped') and all(p['name'].startswith("Scraped")
+                                               for p in store.search('scraped'))
+
+
+def test_version_1_store_is_migrated(tmp_path):
+    path = str(tmp_path / 'catalog.sqlite')
+    db = sqlite3.connect(path)
+    db.executescript("""
+    CREATE TABLE products (id TEXT PRIMARY KEY, source TEXT NOT NULL, position INTEGER NOT NULL,
+        category TEXT, name TEXT, description TEXT, data TEXT NOT NULL, updated REAL NOT NULL);
+    CREATE INDEX products_category ON products (category);
+    CREATE INDEX products_source ON products (source, position);
+    CREATE VIRTUAL TABLE products_fts USING fts5 (name, description, content='products',
+        content_rowid='rowid', tokenize='unicode61');
+    CREATE TRIGGER products_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts (rowid, name, description)
+        VALUES (new.rowid, new.name, new.description);
+    END;
+    CREATE TRIGGER products_ad AFTER DELETE ON products BEGIN SELECT 1; END;
+    CREATE TRIGGER products_au AFTER UPDATE OF name, description ON products BEGIN SELECT 1; END;
+    """)
+    with db:
+        db.executemany('INSERT INTO products VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                       [(p['id'], 'wxr', i, p['category'], p['name'], p['description'],
+                         json.dumps(p), 0) for i, p in enumerate(WXR)])
+    db.close()
+
+    with CatalogStore(path) as store:
+        assert list(store.products()) == WXR
+        assert [p['id'] for p in store.search('"Item 42"')] == ['42']
+        store.replace_source(SCRAPED, 'scrape')
+        assert store.count() == len(WXR) + len(SCRAPED)
+    with CatalogStore(path) as store:
+        assert store.count() == len(WXR) + len(SCRAPED)
+
+
+def test_streamed_exports_match_the_in_memory_ones(tmp_path):
+    with CatalogStore(str(tmp_path / 'catalog.sqlite')) as store:
+        store.replace_source(WXR, 'wxr')
+        store.export_json(str(tmp_path / 'products.json'))
+        assert store.export_sharded(str(tmp_path / 'streamed'), page_size=10)[1] == 0
+    write_sharded(WXR, str(tmp_path / 'in-memory'), page_size=10)
+
+    with open(tmp_path / 'products.json') as f:
+        assert f.read() == json.dumps(WXR, indent=2)
+    assert tree(tmp_path / 'streamed') == tree(tmp_path / 'in-memory')
+
+
+def tree(root):
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            with open(os.path.join(directory, name)) as f:
+                files[os.path.relpath(os.path.join(directory, name), root)] = f.read()
+    return files
@@ -0,0 +1,19 @@
+"""``Categorizer.categorize_many`` must agree with ``categorize`` title by title."""
+from benchmarks.bench_categorize import synthetic_titles
+from kanoha_import.categorize import Categorizer
+
+TITLES = ["Blue Earbuds", "Ceramic Bowl", "Crock-Pot Pots", "USB-C Cables", "Cookware Set",
+          "Sound Bar", "Microphones", "Carpet", "", "Radio\nAlarm Clock", "Two\nlines", "Tote"]
+
+
+def test_batch_matches_single_titles():
+    categorizer = Categorizer.from_file()
+    for titles in (TITLES, TITLES[:-3] + ["Tote"], synthetic_titles(2000), []):
+        assert categorizer.categorize_many(titles) == [categorizer.categorize(t) for t in titles]
+
+
+def test_first_listed_category_wins():
+    categorizer = Categorizer([{'category': "A", 'keywords': ["pan"]},
+                               {'category': "B", 'keywords': ["cook*", "radio"]}])
+    assert categorizer.categorize_many(["Radio Pan", "Cookbook", "Panel", "Pans"]) == [
+        "A", "B", "General Merchandise", "A"]
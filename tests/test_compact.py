@@ -0,0 +1,60 @@
+"""``compact.encode``/``decode`` must give back exactly the records they were given."""
+import pytest
+
+from kanoha_import import compact
+
+
+def product(i, **fields):
+    record = {'id': str(i), 'name': f"Item {i}", 'price': "Contact for Price",
+              'category': "General", 'img': f"/images/products/{i}_Item_{i}.jpg",
+              'description': f"High-quality Item {i} available for wholesale.",
+              'features': ["Authentic", "Fast Shipping"]}
+    record.update(fields)
+    return record
+
+
+CATALOGS = {
+    'plain': [product(i) for i in range(20)],
+    'null plain fields': [product(1, name=None), product(2, img=None), product(3, id=None),
+                          product(4)],
+    'non-string plain fields': [product(1, id=1), product(2, name=2.5), product(3, img=False),
+                                product(4, name=["a"], img={'raw': "x"})],
+    'missing keys': [{'id': "1", 'name': "x"}, {'id': "2", 'img': "/images/products/2.jpg"},
+                     {'name': None}, {}, product(5)],
+    'null and missing mixed': [{'id': "1", 'name': None}, {'id': "2"}, {'id': None, 'price': None},
+                               {'price': "$1", 'img': None}],
+    'awkward values': [product(1, description="{name} literally", features={'raw': [1]}),
+                       product(2, name="6", srcset="/o/2-640.webp 640w"),
+                       product(3, name="", description=""),
+                       product(4, price=0, category=True, features=[]),
+                       product(5, description=None, features=None)],
+    'empty': [],
+}
+
+
+@pytest.mark.parametrize('products', CATALOGS.values(), ids=CATALOGS.keys())
+def test_round_trip(products):
+    assert compact.decode(compact.encode(products)) == products
+    assert compact.loads(compact.dumps(products)) == products
+
+
+@pytest.mark.parametrize('products', CATALOGS.values(), ids=CATALOGS.keys())
+def test_round_trip_preserves_key_order(products):
+    decoded = compact.decode(compact.encode(products))
+    assert [list(p) for p in decoded] == [[k for k in decoded_keys(products) if k in p]
+                                          for p in products]
+
+
+def decoded_keys(products):
+    # Keys come back in order of first appearance across the catalog
+    return list(dict.fromkeys(k for p in products for k in p))
+
+
+@pytest.mark.parametrize('suffix', compact.CONTAINERS)
+def test_containers(suffix, tmp_path):
+    if suffix.startswith('msgpack'):
+        pytest.importorskip('msgpack')
+    products = CATALOGS['null and missing mixed'] + CATALOGS['plain']
+    path = str(tmp_path / f"products.compact.{suffix}")
+    compact.write_compact(products, path)
+    assert compact.read_compact(path) == products
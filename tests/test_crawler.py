@@ -0,0 +1,82 @@
+"""``crawler.crawl`` against local stand-ins for the shop and its image host."""
+import asyncio
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from benchmarks.image_server import ImageServer
+from kanoha_import import crawler
+from kanoha_import.scrape import make_product
+
+
+def shop_pages(image_url):
+    # Page 2 does not parse, page 3 is missing
+    items = lambda page: [{'name': f"Item {page}-{i}", 'price': "$1",
+                           'img_url': f"{image_url}/uploads/{page}-{i}.jpg", 'category': "General"}
+                          for i in range(3)]
+    return {'/shop/page/1/': json.dumps(items(1)), '/shop/page/2/': "not json",
+            '/shop/page/4/': json.dumps(items(4))}
+
+
+@pytest.fixture
+def image_server():
+    with ImageServer(size=2000) as server:
+        yield server
+
+
+@pytest.fixture
+def shop(image_server):
+    pages = shop_pages(image_server.url)
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            body = pages.get(self.path)
+            if body is None:
+                self.send_error(404)
+                return
+            body = body.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/shop/page/{{}}/"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_crawl_skips_broken_pages_and_downloads_images(shop, tmp_path):
+    urls = [shop.format(page) for page in range(1, 5)]
+    products = crawler.crawl(urls, json.loads, make_product, str(tmp_path), rate=100, burst=4)
+
+    assert [p['id'] for p in products] == ['1', '2', '3', '4', '5', '6']
+    assert [p['name'] for p in products] == [f"Item {page}-{i}" for page in (1, 4) for i in range(3)]
+    for product in products:
+        path = os.path.join(tmp_path, os.path.basename(product['img']))
+        assert os.path.getsize(path) > 0
+
+
+def test_crawl_stops_when_image_workers_fail(shop, tmp_path, monkeypatch):
+    async def broken(*args):
+        raise RuntimeError("disk on fire")
+
+    monkeypatch.setattr(crawler, 'fetch_retrying', broken)
+    urls = [shop.format(page) for page in (1, 4)]
+
+    async def crawl():
+        # One worker and a queue of four: without the fix the crawl blocks on put()
+        await asyncio.wait_for(crawler.crawl_async(urls, json.loads, make_product, str(tmp_path),
+                                                   rate=100, image_workers=1), 10)
+
+    with pytest.raises(RuntimeError, match="disk on fire"):
+        asyncio.run(crawl())
@@ -0,0 +1,85 @@
+"""``dedupe.dedupe_products`` on product shots: objects on a white background."""
+import os
+import random
+
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('PIL')
+from PIL import Image, ImageDraw, ImageFilter
+
+from kanoha_import import dedupe
+from kanoha_import.paths import IMAGE_URL, PLACEHOLDER
+
+
+def product_shot(seed):
+    r = random.Random(seed)
+    im = Image.new('RGB', (600, 600), 'white')
+    draw = ImageDraw.Draw(im)
+    for _ in range(r.randint(1, 3)):
+        x, y = r.randint(150, 350), r.randint(150, 350)
+        w, h = r.randint(40, 180), r.randint(40, 180)
+        color = tuple(r.randint(0, 255) for _ in range(3))
+        if r.random() < 0.5:
+            draw.ellipse([x - w // 2, y - h // 2, x + w // 2, y + h // 2], fill=color)
+        else:
+            draw.rectangle([x - w // 2, y - h // 2, x + w // 2, y + h // 2], fill=color)
+    return im.filter(ImageFilter.GaussianBlur(1))
+
+
+def save(image_dir, name, im, **options):
+    im.save(os.path.join(image_dir, name), **options)
+    return {'id': os.path.splitext(name)[0], 'img': IMAGE_URL + name}
+
+
+@pytest.fixture
+def image_dir(tmp_path):
+    path = tmp_path / 'images'
+    path.mkdir()
+    return str(path)
+
+
+def test_only_copies_of_one_photo_are_duplicates(image_dir, tmp_path):
+    products = [save(image_dir, f"{i}.jpg", product_shot(i), quality=90) for i in range(100)]
+    # Re-encoded, resized and converted copies
+    copies = [save(image_dir, "c0.jpg", product_shot(0).resize((420, 420)), quality=60),
+              save(image_dir, "c10.png", product_shot(10)),
+              save(image_dir, "c20.webp", product_shot(20).resize((300, 300)), quality=70)]
+
+    found, duplicates, unused = dedupe.dedupe_products(products + copies, image_dir,
+                                                       str(tmp_path / 'dedupe.json'))
+
+    assert {p['id']: p['duplicateOf'] for p in found if 'duplicateOf' in p} == {
+        'c0': '0', 'c10': '10', 'c20': '20'}
+    assert duplicates == 3 and unused == []
+
+
+def test_matches_are_not_chained():
+    # 0 matches 1 and 1 matches 2, but 2 is nothing like 0
+    assert dedupe._groups([0, 1, 2], [(0, 1), (1, 2)]) == [[0, 1]]
+    assert dedupe._groups([1, 0, 2], [(0, 1), (1, 2)]) == [[1, 0, 2]]
+
+
+def test_placeholder_and_missing_images_are_not_duplicates(image_dir, tmp_path):
+    save(image_dir, os.path.basename(PLACEHOLDER), Image.new('RGB', (100, 100), 'grey'))
+    products = [{'id': '1', 'img': PLACEHOLDER}, {'id': '2', 'img': PLACEHOLDER},
+                save(image_dir, "3.jpg", product_shot(3)), {'id': '4', 'img': PLACEHOLDER},
+                {'id': '5', 'img': IMAGE_URL + "5.jpg"}, {'id': '6', 'img': IMAGE_URL + "5.jpg"}]
+
+    kept, duplicates, unused = dedupe.dedupe_products(products, image_dir,
+                                                      str(tmp_path / 'dedupe.json'), 'merge')
+
+    assert [p['id'] for p in kept] == ['1', '2', '3', '4', '5', '6']
+    assert duplicates == 0 and unused == []
+
+
+def test_merge_leaves_files_to_the_caller(image_dir, tmp_path):
+    products = [save(image_dir, "1.jpg", product_shot(1)),
+                save(image_dir, "2.jpg", product_shot(1).resize((300, 300)))]
+
+    kept, duplicates, unused = dedupe.dedupe_products(products, image_dir,
+                                                      str(tmp_path / 'dedupe.json'), 'merge')
+
+    assert [p['id'] for p in kept] == ['1']
+    assert unused == [os.path.join(image_dir, "2.jpg")]
+    assert os.path.exists(unused[0])
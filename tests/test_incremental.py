@@ -0,0 +1,36 @@
+"""``xml attachments --incremental`` against a synthetic export and a local image host."""
+import json
+import os
+
+import pytest
+
+from benchmarks.image_server import ImageServer
+from benchmarks.wxr_gen import generate_wxr
+from kanoha_import import xml_attachments
+from kanoha_import.paths import Paths
+
+
+@pytest.fixture
+def paths(tmp_path):
+    with ImageServer(size=2000) as server:
+        xml_file = str(tmp_path / 'export.xml')
+        generate_wxr(xml_file, 40, server.url)
+        yield Paths(str(tmp_path / 'site'), xml_file)
+
+
+def test_unchanged_export_still_writes_the_requested_outputs(paths, capsys):
+    assert xml_attachments.run(paths, incremental=True) == 0
+    with open(paths.data_file) as f:
+        products = json.load(f)
+    mtime = os.stat(paths.data_file).st_mtime_ns
+    capsys.readouterr()
+
+    assert xml_attachments.run(paths, incremental=True, sharded=True, search_index=True) == 0
+
+    assert "No changes since the last import." in capsys.readouterr().out
+    with open(os.path.join(paths.shard_dir, 'manifest.json')) as f:
+        assert json.load(f)['count'] == len(products) == 20
+    with open(paths.search_index_file) as f:
+        assert json.load(f)['ids'] == [p['id'] for p in products]
+    # Nothing changed, so products.json was left alone
+    assert os.stat(paths.data_file).st_mtime_ns == mtime
@@ -0,0 +1,61 @@
+"""Offline scrapes from the recorded shop pages in ``fixtures/shop-cache``."""
+import json
+import os
+import re
+
+import pytest
+
+from kanoha_import import scrape
+from kanoha_import.paths import IMAGE_URL, PLACEHOLDER, Paths
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'shop-cache')
+BASE_URL = "https://kanohagoods.com/shop/page/{}/"
+
+
+class RegexBackend:
+    """Just enough of an html_backends backend for the recorded pages."""
+
+    def extract(self, html):
+        items = []
+        for match in re.finditer(r'<li class="([^"]*)">(.*?)</li>', html, re.S):
+            classes, body = match.groups()
+            title = re.search(r'<h2[^>]*>(.*?)</h2>', body).group(1)
+            price = re.search(r'<span class="price">(.*?)</span>', body)
+            src = re.search(r'<img src="([^"]*)"', body)
+            items.append({'title': title, 'h2': title, 'price': price and price.group(1),
+                          'img': {'src': src.group(1)} if src else None,
+                          'classes': classes.split()})
+        return items
+
+
+@pytest.fixture
+def paths(tmp_path, monkeypatch):
+    monkeypatch.setattr(scrape, 'get_backend', RegexBackend)
+    paths = Paths(str(tmp_path))
+    paths.ensure()
+    # One image survives from an earlier run
+    with open(os.path.join(paths.image_dir, "2_Ray-Ban_Aviator.jpg"), 'wb') as f:
+        f.write(b'\xff\xd8\xff\xd9')
+    return paths
+
+
+EXPECTED = [('1', "Nike Dunk Low", "$120.00", "Sneakers", PLACEHOLDER),
+            ('2', "Ray-Ban Aviator", "$95.00", "Eyewear", IMAGE_URL + "2_Ray-Ban_Aviator.jpg"),
+            ('3', "LEGO Technic 42115", "$380.00", "Toys", PLACEHOLDER)]
+
+
+def scraped(paths):
+    with open(paths.data_file) as f:
+        return [(p['id'], p['name'], p['price'], p['category'], p['img']) for p in json.load(f)]
+
+
+@pytest.mark.parametrize('crawl', [False, True])
+def test_replay(paths, crawl, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(scrape.time, 'sleep', sleeps.append)
+
+    scrape.run(paths, pages=3, base_url=BASE_URL, crawl=crawl, cache_dir=FIXTURES, replay=True)
+
+    # Page 3 was never recorded; it is a miss, but still no reason to wait
+    assert scraped(paths) == EXPECTED
+    assert sleeps == []